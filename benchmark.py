@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# Author: Lu Xu <oliver_lew at outlook dot com>
+# License: MIT License Copyright (c) 2021 Lu Xu
+"""
+Benchmark cpass on synthetic password stores, to compare between versions.
+
+The stores are generated once in the benchmark directory and reused. The
+passwords are empty files, a stub gpg (and pass) prints a fake password
+after a configurable latency. Each store is benchmarked in a fresh process,
+driving the interface headlessly and drawing to a pseudo terminal with the
+urwid raw display. The results, times and peak memory, are printed as JSON.
+
+    python3 benchmark.py --stores flat,wide --latency 0.02 -o before.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+
+# shape: (depth, sub-folders in each folder, passwords in each folder)
+STORES = {
+    'flat': (0, 0, 100000),
+    'deep': (10, 2, 50),
+    'wide': (1, 5, 20000),
+}
+SIZE = (120, 40)
+
+STUB = r'''#!/bin/sh
+# stub {name} for the cpass benchmark, prints a fake password of the last argument
+sleep "${{CPASS_BENCH_LATENCY:-0}}"
+for last; do :; done
+name=$(basename "$last" .gpg)
+printf 'password-%s\nlogin: %s\nurl: https://%s.example\n' "$name" "$name" "$name"
+'''
+
+
+def generate(path, depth, folders, files, level=0):
+    os.makedirs(path, exist_ok=True)
+    for i in range(files):
+        open(os.path.join(path, 'account-{:06d}.gpg'.format(i)), 'w').close()
+    if level < depth:
+        for i in range(folders):
+            generate(os.path.join(path, 'folder-{}'.format(i)), depth, folders, files,
+                     level + 1)
+
+
+def prepare(bench_dir, stores):
+    """ generate the missing stores, the stubs and the configuration """
+    for name in stores:
+        store = os.path.join(bench_dir, 'stores', name)
+        done = os.path.join(bench_dir, 'stores', name + '.done')
+        if not os.path.exists(done) or open(done).read() != repr(STORES[name]):
+            print("Generating the {} store...".format(name), file=sys.stderr)
+            shutil.rmtree(store, ignore_errors=True)
+            generate(store, *STORES[name])
+            with open(done, 'w') as f:
+                f.write(repr(STORES[name]))
+
+    bin_dir = os.path.join(bench_dir, 'bin')
+    os.makedirs(bin_dir, exist_ok=True)
+    for name in ['gpg', 'gpg2', 'pass']:
+        stub = os.path.join(bin_dir, name)
+        with open(stub, 'w') as f:
+            f.write(STUB.format(name=name))
+        os.chmod(stub, 0o755)
+
+
+class Timer:
+    """ collect the time of repeated operations """
+    def __init__(self):
+        self.results = {}
+
+    def time(self, name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.results.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        summary = {}
+        for name, times in self.results.items():
+            times = sorted(times)
+            p95 = times[min(len(times) - 1, len(times) * 95 // 100)]
+            summary[name] = {
+                'count': len(times),
+                'total_ms': round(sum(times) * 1000, 3),
+                'p50_ms': round(times[len(times) // 2] * 1000, 3),
+                'p95_ms': round(p95 * 1000, 3),
+                'max_ms': round(times[-1] * 1000, 3),
+            }
+        return summary
+
+
+def run_store(name, bench_dir, iterations):
+    """ benchmark one store in this process, the environment is set by main() """
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import cpass
+    cpass.setup()
+    import cpass_tui
+    import urwid
+
+    timer = Timer()
+    memory = {}
+
+    def checkpoint(phase):
+        # peak resident memory of the process so far
+        memory[phase] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def pump(until, timeout=30):
+        """ deliver the background results, like the main loop does """
+        deadline = time.monotonic() + timeout
+        while not until() and time.monotonic() < deadline:
+            import select
+            if select.select([cpass.dispatcher._read_fd], [], [], 0.01)[0]:
+                cpass.dispatcher._dispatch()
+
+    Pass = cpass.Pass
+    # the index is in the benchmark home, so the first scan is a cold one
+    cpass.Pass.index.clear()
+    timer.time('extract_all_cold', Pass.extract_all)
+    Pass.all_pass.clear()
+    Pass.paths = []
+    timer.time('extract_all_warm', Pass.extract_all)
+    checkpoint('scan')
+    Pass.finder = timer.time('build_finder', Pass.build_finder)
+    # in the names, in the folders, both, and none
+    for pattern in ['account', '00012', 'folder', 'folder-1', 'f', 'Folder', 'folder-1 999',
+                    'nothing']:
+        timer.time('finder_find', Pass.finder.find, pattern)
+    checkpoint('finder')
+
+    # draw to a pseudo terminal, which is drained by a thread
+    master, slave = os.openpty()
+
+    def drain():
+        try:
+            while os.read(master, 65536):
+                pass
+        except OSError:
+            # the terminal is closed
+            pass
+    threading.Thread(target=drain, daemon=True).start()
+    term = os.fdopen(slave, 'w')
+    raw = urwid.display.raw if hasattr(urwid, 'display') else urwid.raw_display
+    screen = raw.Screen(input=term, output=term)
+    screen.register_palette(cpass.config.palette)
+    screen.start()
+
+    def key(k):
+        ui.keypress(SIZE, k)
+        screen.draw_screen(SIZE, ui.render(SIZE, focus=True))
+
+    try:
+        ui = timer.time('ui_create', cpass_tui.UI)
+        timer.time('first_frame',
+                   lambda: screen.draw_screen(SIZE, ui.render(SIZE, focus=True)))
+
+        # the folder with the most passwords, where the list operations are slow
+        root = max(Pass.all_pass, key=lambda r: Pass.all_pass[r].count)
+        for part in root.split('/') if root else []:
+            ui.listbox.jump(os.path.join(ui.listbox.root, part), True)
+            key('l')
+        for _ in range(iterations):
+            timer.time('list_navigate', key, 'j')
+        for _ in range(iterations):
+            timer.time('list_navigate_screen', key, 'page down')
+        timer.time('list_navigate_end', key, 'G')
+        timer.time('list_navigate_home', key, 'g')
+
+        # in and out of the sub-folders, or the folder itself
+        for _ in range(iterations // 10 or 1):
+            ui.listbox.list_navigate(new_focus=0)
+            if ui.listbox.focus.isdir:
+                timer.time('dir_navigate', key, 'l')
+                timer.time('dir_navigate', key, 'h')
+            elif root:
+                timer.time('dir_navigate', key, 'h')
+                timer.time('dir_navigate', key, 'l')
+
+        ui._search_pattern = '999'
+        for _ in range(iterations // 10 or 1):
+            timer.time('search_in_dir', ui.search_in_dir, ui._search_pattern, 1)
+        checkpoint('navigation')
+
+        # the same changes as inserting or deleting a password in cpass
+        for i in range(iterations):
+            timer.time('insert', ui.listbox.insert, 'bench-{:06d}'.format(i))
+        for i in range(iterations):
+            pos = Pass.all_pass[ui.listbox.root].position('bench-{:06d}'.format(i), False)
+            timer.time('delete', ui.listbox.delete, pos)
+
+        # from the key press until the decrypted password is shown, resting on
+        # each password for a moment like reading it
+        ui.listbox.list_navigate(new_focus=Pass.all_pass[ui.listbox.root].ndirs)
+        for _ in range(iterations // 10 or 1):
+            def preview():
+                key('j')
+                pump(lambda: ui._preview_future is None)
+            timer.time('preview', preview)
+            pump(lambda: False, timeout=0.2)
+        checkpoint('interface')
+    finally:
+        screen.stop()
+        cpass.dispatcher.shutdown()
+
+    folders = len(Pass.all_pass)
+    return {
+        'entries': sum(f.count for f in Pass.all_pass.values()) - folders + 1,
+        'folders': folders,
+        'timings': timer.summary(),
+        'peak_rss_kb': memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--stores', default=','.join(STORES),
+                        help="comma separated store shapes, from " + ', '.join(STORES))
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds the stub gpg takes to decrypt a password")
+    parser.add_argument('--backend', default='gpg', choices=['gpg', 'pass'])
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help="passwords to prefetch around the focus, see cpass.cfg")
+    parser.add_argument('--iterations', type=int, default=200,
+                        help="repetitions of the interactive operations")
+    parser.add_argument('--dir',
+                        default=os.path.join(tempfile.gettempdir(), 'cpass-benchmark'),
+                        help="where the stores are generated, reused between runs")
+    parser.add_argument('-o', '--output', help="write the JSON here instead of stdout")
+    parser.add_argument('--run-store', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_store:
+        result = run_store(args.run_store, args.dir, args.iterations)
+        json.dump(result, sys.stdout)
+        return
+
+    stores = args.stores.split(',')
+    for name in stores:
+        if name not in STORES:
+            parser.error("unknown store: {}".format(name))
+    prepare(args.dir, stores)
+
+    home = os.path.join(args.dir, 'home')
+    os.makedirs(os.path.join(home, '.config', 'cpass'), exist_ok=True)
+    with open(os.path.join(home, '.config', 'cpass', 'cpass.cfg'), 'w') as f:
+        f.write("[ui]\nwatch = false\n[pass]\nbackend = {}\n"
+                "[cache]\nprefetch = {}\n".format(args.backend, args.prefetch))
+
+    import urwid
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import cpass
+    results = {
+        'cpass': cpass.version,
+        'urwid': urwid.__version__,
+        'python': platform.python_version(),
+        'latency': args.latency,
+        'backend': args.backend,
+        'prefetch': args.prefetch,
+        'iterations': args.iterations,
+        'stores': {},
+    }
+    for name in stores:
+        env = dict(os.environ, HOME=home, XDG_CACHE_HOME=os.path.join(home, '.cache'),
+                   PASSWORD_STORE_DIR=os.path.join(args.dir, 'stores', name),
+                   CPASS_BENCH_LATENCY=str(args.latency),
+                   PATH=os.path.join(args.dir, 'bin') + os.pathsep + os.environ['PATH'])
+        env.pop('XDG_CONFIG_DIR', None)
+        env.pop('DEBUG', None)
+        # a fresh process for each store, for the peak memory
+        print("Benchmarking the {} store...".format(name), file=sys.stderr)
+        res = subprocess.run([sys.executable, __file__, '--run-store', name,
+                              '--dir', args.dir, '--iterations', str(args.iterations)],
+                             env=env, stdout=subprocess.PIPE, text=True)
+        if res.returncode != 0:
+            sys.exit("Benchmark of the {} store failed".format(name))
+        results['stores'][name] = json.loads(res.stdout)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
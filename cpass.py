@@ -4,574 +4,1241 @@
 
 import os
 import re
-import urwid
+import sys
+import json
+import math
+import heapq
+import shutil
+import string
+import secrets
+import bisect
+import hmac
+import hashlib
+import threading
+import time
 import logging
 import tempfile
 import configparser
-from subprocess import run, PIPE, DEVNULL
+import functools
+import itertools
+from array import array
+from collections import OrderedDict
+from subprocess import run, Popen, PIPE, DEVNULL, CompletedProcess, SubprocessError
 
 version = "0.9.4"
 
 
-class PassNode(urwid.AttrMap):
-    def __init__(self, node, root, isdir=False):
-        self.empty = node is None
-        self.isdir = isdir
-        self.node = node or "-- EMPTY --"
-        self.path = os.path.join(root, node) if node else ''
-        self.icon = config.icon_dir if isdir else config.icon_file if node else ''
-
-        self._selectable = True
-        super().__init__(urwid.Columns([
-                ('pack', urwid.Text(self.icon)),
-                urwid.Text(self.node, wrap='clip'),
-                ('pack', urwid.Text(''))
-            ]),
-            'dir' if isdir else '' if node else 'bright',
-            'focusdir' if isdir else 'focus' if node else 'bright',
-        )
-
-        self.update_count()
-
-    def update_count(self):
-        # 'topdown' option in os.walk makes this possible (see Pass.extract_all),
-        # so that children folders are traversed before its parent (the 'len'
-        # function below can be executed).
-        if self.isdir:
-            count = len(Pass.all_pass[self.path])
-            self.original_widget.contents[2][0].set_text(str(count))
-
-    def keypress(self, size, key):
-        """ let the widget pass through the keys to parent widget """
-        return key
-
-
-class PassList(urwid.ListBox):
-    def __init__(self, body, root='', ui=None):
-        self._ui = ui
-        self.root = root
-        self._size = (1, 1)
-        super().__init__(body)
-
-    def mouse_event(self, size, event, button, col, row, focus):
-        self._size = size
-        focus_offset = self.get_focus_offset_inset(size)[0]
-
-        logging.debug("passlist mouse event: {} {} {} {} {} {} {} {}".format(
-            size, event, button, col, row, focus, self.focus_position, focus_offset
-        ))
-
-        if button == 1:
-            if size[1] > len(self.body):
-                # NOTE: offset is wrong(?) when size is larger than length
-                # so the processing is different
-                if row == self.focus_position:
-                    self.dir_navigate('down')
-                else:
-                    self.list_navigate(new_focus=row)
-            else:
-                if row == focus_offset:
-                    self.dir_navigate('down')
-                else:
-                    self.list_navigate(new_focus=self.focus_position - focus_offset + row)
-        elif button == 3:
-            self.dir_navigate('up')
-        elif button == 4:
-            self.list_navigate(-1)
-        elif button == 5:
-            self.list_navigate(1)
+class Folder:
+    """
+    A folder in the password store, independent of the UI widgets.
+
+    Sub-folders and passwords share one list of names, each part sorted
+    case-insensitively, with the first 'ndirs' names being the sub-folders.
+    The lower case sort keys are kept in a parallel list for bisection, and
+    the names are also kept in sets for existence checks.
+    The names are interned, since the same names repeat across the store.
+    'total' is the number of passwords in the whole subtree, None if unknown,
+    see Pass.add_folder and Pass.add_total.
+    """
+    __slots__ = ('path', 'names', 'keys', 'ndirs', 'pos', 'total', '_dirs', '_files')
+
+    def __init__(self, path, dirs=(), files=()):
+        self.path = sys.intern(path)
+        dirs = sorted(map(sys.intern, dirs), key=str.lower)
+        files = sorted(map(sys.intern, files), key=str.lower)
+        self.names = dirs + files
+        self.keys = [sys.intern(n.lower()) for n in self.names]
+        self.ndirs = len(dirs)
+        self.pos = 0  # cursor position
+        self.total = None
+        self._dirs = set(dirs)
+        self._files = set(files)
+
+    @property
+    def count(self):
+        return len(self.names)
+
+    def entry(self, pos):
+        """ (name, isdir) at the position, name is None if out of range """
+        if 0 <= pos < len(self.names):
+            return self.names[pos], pos < self.ndirs
+        return None, False
+
+    def entries(self):
+        """ iterate over (name, isdir) pairs """
+        for i, name in enumerate(self.names):
+            yield name, i < self.ndirs
+
+    def position(self, name, isdir=False):
+        """ position of the name, None if not existing """
+        if name not in (self._dirs if isdir else self._files):
+            return None
+        lo, hi = (0, self.ndirs) if isdir else (self.ndirs, len(self.names))
+        pos = bisect.bisect_left(self.keys, name.lower(), lo, hi)
+        # names only differ in cases have the same key
+        while self.names[pos] != name:
+            pos += 1
+        return pos
+
+    def insert(self, name, isdir=False):
+        """ insert a name if not existing, return its position """
+        pos = self.position(name, isdir)
+        if pos is not None:
+            return pos
+
+        name = sys.intern(name)
+        key = sys.intern(name.lower())
+        lo, hi = (0, self.ndirs) if isdir else (self.ndirs, len(self.names))
+        pos = bisect.bisect_right(self.keys, key, lo, hi)
+        self.names.insert(pos, name)
+        self.keys.insert(pos, key)
+        # keep the cursor on the same entry
+        if pos <= self.pos and len(self.names) > 1:
+            self.pos += 1
+        if isdir:
+            self.ndirs += 1
+            self._dirs.add(name)
         else:
-            return super().mouse_event(size, event, button, col, row, focus)
-
-    def keypress(self, size, key):
-        self._size = size
-        logging.debug("passlist keypress: {} {}".format(key, size))
-
-        list_navigation_offsets = {
-            'down': 1,
-            'up': -1,
-            # overshoot to go to bottom/top
-            'end': len(self.body),
-            'home': -len(self.body),
-            'down_screen': size[1],
-            'up_screen': -size[1],
-            'down_half_screen': size[1] // 2,
-            'up_half_screen': -size[1] // 2,
-        }
-
-        dir_navigation_directions = {
-            # the confirm key doubles as enter folder key
-            'confirm': 'down',
-            'dir_down': 'down',
-            'dir_up': 'up',
-        }
+            self._files.add(name)
+        return pos
 
-        action = config.keybindings.get(key)
-        if action in list_navigation_offsets:
-            self.list_navigate(list_navigation_offsets[action])
-        elif action in dir_navigation_directions:
-            self.dir_navigate(dir_navigation_directions[action])
+    def pop(self, index=-1):
+        if not self.names:
+            return
+        index %= len(self.names)
+        name = self.names.pop(index)
+        del self.keys[index]
+        if index < self.pos:
+            self.pos -= 1
+        if index < self.ndirs:
+            self.ndirs -= 1
+            self._dirs.discard(name)
         else:
-            return super().keypress(size, key)
+            self._files.discard(name)
 
-    def dir_navigate(self, direction):
-        # record current position
-        Pass.all_pass[self.root].pos = self.focus_position
+    def update(self, dirs, files):
+        """
+        apply a new listing of the folder, keep the cursor on the same entry if
+        it still exists, return the added and removed (name, isdir) pairs
+        """
+        focused = self.entry(self.pos)
+        old = set(self.entries())
+        new = {(d, True) for d in dirs} | {(f, False) for f in files}
 
-        # change root position accordingly
-        if direction in 'down' and self.focus.isdir:
-            self.root = os.path.join(self.root, self.focus.node)
-        elif direction in 'up':
-            self.root = os.path.dirname(self.root)
+        for name, isdir in old - new:
+            self.pop(self.position(name, isdir))
+        for name, isdir in new - old:
+            self.insert(name, isdir)
 
-        # update listbox content, this way the list itself is not replaced
-        self.body[:] = Pass.all_pass[self.root]
+        pos = self.position(*focused) if focused[0] else None
+        self.pos = pos if pos is not None else min(self.pos, max(0, self.count - 1))
+        return new - old, old - new
 
-        # restore cursor position of the new root
-        self.focus_position = Pass.all_pass[self.root].pos
 
-        self._ui.update_view()
+class FindIndex:
+    """
+    Index of all the password paths for the store-wide finder.
 
-    def list_navigate(self, shift=0, new_focus=None):
-        """ either specify a shift offset, or an absolute target position """
-        offset = self.get_focus_offset_inset(self._size)[0]
+    The folders are few and repeated by many paths, so a query checks each
+    folder once, and only the password names through an index, which maps
+    the letters, bigrams and trigrams of the lower case names to the ids of
+    the paths. The ids are given from the shortest path, so all the lists of
+    ids are in that order too, and a query stops after the first matches.
+    """
+    def __init__(self, paths=()):
+        self.paths = []
+        self.lower = []
+        self.bases = array('I')  # where the password names start
+        self.fids = array('I')  # folder ids of the paths
+        self.folders = []
+        self.lower_folders = []
+        self.members = []  # ids of the paths in each folder
+        self.folder_ids = {}
+        self.grams = {}
+        self.ids = {}
+        self.removed = set()
+        self.ready = False
+        # the changes before it is ready, to apply to the one built in background
+        self.changes = []
+        for path in sorted(sorted(paths), key=len):
+            self._add(path)
+
+    def add(self, path):
+        if not self.ready:
+            self.changes.append((True, path))
+        self._add(path)
+
+    def _add(self, path):
+        if path in self.ids:
+            return
+        i = len(self.paths)
+        low = path.lower()
+        base = low.rfind('/') + 1
+        folder = path[:max(0, base - 1)]
+        fid = self.folder_ids.get(folder)
+        if fid is None:
+            fid = self.folder_ids[folder] = len(self.folders)
+            self.folders.append(folder)
+            self.lower_folders.append(folder.lower())
+            self.members.append(array('I'))
+        self.ids[path] = i
+        self.paths.append(path)
+        self.lower.append(low)
+        self.bases.append(base)
+        self.fids.append(fid)
+        self.members[fid].append(i)
+        name = low[base:]
+        for gram in {name[j:j + n] for n in (1, 2, 3) for j in range(len(name) - n + 1)}:
+            ids = self.grams.get(gram)
+            if ids is None:
+                ids = self.grams[gram] = array('I')
+            ids.append(i)
+
+    def remove(self, path):
+        """ remove a password, or all the passwords under a folder """
+        if not self.ready:
+            self.changes.append((False, path))
+        i = self.ids.pop(path, None)
+        if i is not None:
+            self.removed.add(i)
+        prefix = path + '/'
+        for folder, fid in self.folder_ids.items():
+            if folder == path or folder.startswith(prefix):
+                for i in self.members[fid]:
+                    # a removed path which was added again has a new id
+                    if self.ids.get(self.paths[i]) == i:
+                        del self.ids[self.paths[i]]
+                        self.removed.add(i)
+
+    def finish(self):
+        self.ready = True
+        return self
+
+    def apply(self, changes):
+        for added, path in changes:
+            if added:
+                self.add(path)
+            else:
+                self.remove(path)
 
-        if new_focus is not None:
-            shift = new_focus - self.focus_position
+    def find(self, pattern, limit=100):
+        """
+        paths containing all the space separated words of the pattern, those
+        with the first word in the password name and shorter ones come first
+        """
+        words = pattern.split()
+        if not words:
+            return []
+        # ignore case if all letters are lower case
+        if pattern == pattern.lower():
+            texts, folders = self.lower, self.lower_folders
         else:
-            new_focus = shift + self.focus_position
-        new_offset = offset + shift
-
-        # border check
-        new_focus = min(max(0, new_focus), len(self.body) - 1)
-        new_offset = min(max(0, new_offset), self._size[1] - 1)
-
-        self.change_focus(self._size, new_focus, offset_inset=new_offset)
-        self._ui.update_view()
-
-    def insert(self, node):
-        def insert_relative(r, n):
-            # if starts with /, then assume the node is relative to store root
-            if n.startswith('/'):
-                n = n.lstrip('/')
-                r = ''
-
-            # separate at the first /
-            n1, sep, n2 = n.partition('/')
-            # recursively insert if there are more levels
-            if sep == '/':
-                insert_relative(os.path.join(r, n1), n2)
-
-            # change stored list
-            passnode = PassNode(n1, r, sep == '/')
-            if Pass.all_pass.get(r) is None:
-                Pass.all_pass[r] = FolderWalker(r)
-            Pass.all_pass[r].pos = Pass.all_pass[r].insert(passnode)
-
-            # do not change cursor position if the path is not relative
-            return Pass.all_pass[r].pos if r == self.root else None
-
-        inserted_pos = insert_relative(self.root, node.strip())
-        # change listwalker
-        self.body[:] = Pass.all_pass[self.root]
-        # focus the new node
-        self.list_navigate(new_focus=inserted_pos)
-
-        self._ui.update_view()
-
-    def delete(self, pos):
-        # change stored list
-        Pass.all_pass[self.root].pop(pos)
-        # change listwalker
-        self.body[:] = Pass.all_pass[self.root]
-
-        self._ui.update_view()
-
-    # TODO: this seems odd being here
-    def update_root_count(self):
-        for n in Pass.all_pass[os.path.dirname(self.root)]:
-            if n.node == self.root and n.isdir:
-                n.update_count()
-                return
+            texts, folders = self.paths, self.folders
+        bases, fids, first = self.bases, self.fids, words[0]
+        specs = [self._spec(w, folders) for w in words]
+
+        def matches(ids, in_name):
+            last = None
+            for i in ids:
+                if i == last:
+                    continue
+                last = i
+                text, base, fid = texts[i], bases[i], fids[i]
+                if ((specs[0][1] is None and text.find(first, base) >= 0) == in_name
+                        and i not in self.removed
+                        and all(fid in whole or (
+                            text.find(tail, base) >= 0 if ends is None
+                            else fid in ends and text.startswith(tail, base))
+                            for whole, ends, tail in specs)):
+                    yield i
+
+        # go through the fewest paths which may match, in the order of their ids
+        others = [self._candidates(spec) for spec in specs[1:]]
+        names = self._names(first) if specs[0][1] is None else ()
+        best = min([(len(names), names)] + others, key=lambda c: c[0])[1]
+        rest = min([self._rest(specs)] + others, key=lambda c: c[0])[1]
+        best = list(itertools.islice(matches(best, True), limit))
+        return [self.paths[i] for i in best + list(
+            itertools.islice(matches(rest, False), limit - len(best)))]
 
+    @staticmethod
+    def scan(folders, pattern, limit=100):
+        """
+        the same as find, for a one-off query without the index, matching the
+        (folder, password names) as they come, see Pass.walk_folders
+        """
+        words = pattern.split()
+        if not words:
+            return []
+        fold = str.lower if pattern == pattern.lower() else str
+        first = words[0]
+        found = []  # the best (not in name, length, path) so far, in order
+        for folder, names in folders:
+            prefix = folder + '/' if folder else ''
+            text = fold(prefix)
+            # all the names at once, much faster than one by one
+            blob = fold('\n'.join(names))
+            if any('/' not in w and w not in text and w not in blob for w in words):
+                continue
+            lows = blob.split('\n')
+            if len(lows) != len(names):
+                lows = [fold(n) for n in names]
+            ids = range(len(names))
+            for w in words:
+                if '/' in w:
+                    ids = [i for i in ids if w in text + lows[i]]
+                elif w not in text:
+                    ids = [i for i in ids if w in lows[i]]
+            if '/' in first or first in text:
+                groups = [(False, [i for i in ids if first in lows[i]]),
+                          (True, [i for i in ids if first not in lows[i]])]
+            else:
+                groups = [(False, ids)]
+            for other, group in groups:
+                group = list(map(names.__getitem__, group))
+                # skip the folder if even its shortest path can not be in the results
+                if not group or len(found) == limit and (
+                        other, len(prefix) + min(map(len, group)), prefix) >= found[-1]:
+                    continue
+                # the shortest and then the first names, so the paths are in order too
+                for size, name in heapq.nsmallest(limit, zip(map(len, group), group)):
+                    key = (other, len(prefix) + size, prefix + name)
+                    if len(found) == limit and key >= found[-1]:
+                        break
+                    bisect.insort(found, key)
+                    del found[limit:]
+        return [path for _, _, path in found]
 
-class FolderWalker(list):
-    """
-    Customize list operations, mainly
-    - keep a placeholder item in empty list and
-    - keep items sorted
+    @staticmethod
+    def _spec(word, folders):
+        """
+        (folders containing the word, folders it may begin in, the rest in the
+        name) of a word. A word without '/' may be anywhere in the name instead,
+        and the second is None.
+        """
+        if '/' not in word:
+            return {f for f, folder in enumerate(folders) if word in folder}, None, word
+        head, _, tail = word.rpartition('/')
+        head += '/'
+        # the root folder is '', the others are followed by '/' in the paths
+        slashed = [folder + '/' if folder else '' for folder in folders]
+        return ({f for f, folder in enumerate(slashed) if word in folder},
+                {f for f, folder in enumerate(slashed) if folder.endswith(head)}, tail)
+
+    def _names(self, word):
+        """ ids of the paths whose names may contain the word, by its rarest n-gram """
+        word = word.lower()
+        n = min(3, len(word))
+        if n == 0:
+            return ()
+        return min((self.grams.get(word[j:j + n], ()) for j in range(len(word) - n + 1)),
+                   key=len)
+
+    def _candidates(self, spec):
+        """ (count, ids) of the paths which may contain a word, in the folder or name """
+        whole, ends, tail = spec
+        ids = [self.members[f] for f in whole]
+        names = self._names(tail)
+        if ends is not None and sum(len(self.members[f]) for f in ends) < len(names):
+            # the name has to follow one of these folders
+            ids += [self.members[f] for f in ends]
+        else:
+            ids.append(names)
+        return sum(len(i) for i in ids), heapq.merge(*ids)
+
+    def _rest(self, specs):
+        """ (count, ids) of the paths which may have the first word in the folder """
+        if specs[0][1] is not None:
+            return self._candidates(specs[0])
+        # the folders where the same words have to be in the names
+        groups = {}
+        for f in specs[0][0]:
+            missing = tuple(k for k, (whole, _, _) in enumerate(specs) if f not in whole)
+            groups.setdefault(missing, set()).add(f)
+        ids, count = [], 0
+        for missing, folders in groups.items():
+            if not missing:
+                ids += [self.members[f] for f in folders]
+                count += sum(len(self.members[f]) for f in folders)
+                continue
+            names = min((self._names(specs[k][2]) for k in missing), key=len)
+            ids.append(i for i in names if self.fids[i] in folders)
+            count += len(names)
+        return count, heapq.merge(*ids)
+
+
+class Watcher:
     """
-    def __init__(self, root, dirs=[], files=[]):
-        self.pos = 0  # cursor position
+    Watch the scanned folders with inotify, so that the changes made outside of
+    cpass, e.g. by 'pass git pull', show up without rescanning the store.
 
-        self[:] = [PassNode(f, root, True) for f in sorted(dirs, key=str.lower)] + \
-                  [PassNode(f, root) for f in sorted(files, key=str.lower)]
+    inotify is called through ctypes, which only works on Linux.
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+
+    def __init__(self, store):
+        import ctypes
+        import ctypes.util
+        import struct
+        self.store = store
+        self._wds = {}  # watch descriptor -> folder
+        self._roots = {}  # folder -> watch descriptor
+        self._event = struct.Struct('iIII')
+        self._errno = ctypes.get_errno
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(self._errno(), "inotify_init1 failed")
+
+    def watch(self, root):
+        if root in self._roots:
+            return
+        path = os.path.join(self.store, root).encode()
+        wd = self._libc.inotify_add_watch(self.fd, path, self.MASK)
+        if wd < 0:
+            # e.g. exceeding fs.inotify.max_user_watches, the folder is just not watched
+            logging.warning("Can not watch {}: {}".format(path, os.strerror(self._errno())))
+            return
+        self._wds[wd] = root
+        self._roots[root] = wd
+
+    def move(self, root, new):
+        """ follow a moved folder, the watch is on the same folder still """
+        wd = self._roots.pop(root, None)
+        if wd is not None:
+            self._wds[wd] = new
+            self._roots[new] = wd
+
+    def unwatch(self, root):
+        wd = self._roots.pop(root, None)
+        if wd is not None:
+            self._wds.pop(wd, None)
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self):
+        """
+        read the pending events, return a mapping from the changed folders
+        to the changed names within, or None if the events overflowed
+        """
+        changes = {}
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._event.unpack_from(data, offset)
+                name = data[offset + self._event.size:offset + self._event.size + length]
+                offset += self._event.size + length
+
+                overflow |= bool(mask & self.IN_Q_OVERFLOW)
+                if mask & self.IN_IGNORED:
+                    # the folder is removed, or unwatched
+                    root = self._wds.pop(wd, None)
+                    if self._roots.get(root) == wd:
+                        del self._roots[root]
+                elif wd in self._wds:
+                    changes.setdefault(self._wds[wd], set()).add(
+                        os.fsdecode(name.rstrip(b'\0')))
+        return None if overflow else changes
+
+
+class PassTree(dict):
+    """
+    Mapping from folder paths to Folders. A folder which is not in the
+    mapping yet is scanned from the disk on first access, so that in lazy mode
+    only the visited folders are ever listed.
+    """
+    def __missing__(self, root):
+        dirs, files = Pass.listdir(root)
+        return Pass.add_folder(root, dirs, files)
 
-        # prevent empty list, which troubles listbox operations
-        if len(self) == 0:
-            super().append(PassNode(None, None))
 
-    def pop(self, index=-1):
-        super().pop(index)
-
-        # add a empty placeholder
-        if len(self) == 0:
-            super().append(PassNode(None, None))
-
-    def insert(self, node):
-        # if node already exist, return the index
-        for n in self:
-            if n.node == node.node and n.isdir == node.isdir:
-                return self.index(n)
-
-        # pop the empty placeholder node beforehand
-        if len(self) == 1 and self[0].empty:
-            super().pop()
-
-        # insert and sort, with directories sorted before files
-        super().insert(self.pos, node)
-        self[:] = sorted([n for n in self if n.isdir], key=lambda n: n.node.lower()) + \
-            sorted([n for n in self if not n.isdir], key=lambda n: n.node.lower())
-        return self.index(node)
-
-
-# TODO: auto change split direction based on terminal size
-# TODO: multiline insert, this should be easy since we have the workaround in Pass.edit
-# TODO: mv, cp support
-# TODO: QR code generate, maybe?
-# TODO: background preview, or/and cache preview results
-# TODO: CLI arguments
-# TODO: git support
-# TODO: otp support
-class UI(urwid.Frame):
-    def __init__(self):
-        self._app_string = 'cPass'
-        self._help_string = ' a:generate d:delete e:edit i:insert y:copy z:toggle /:search'
-        self._edit_type = None
-        self._last_preview = None
-        self._preview_shown = True
-        self._search_pattern = None
-        self._search_direction = 1
-
-        # header
-        self.header_prefix = urwid.Text(('border', '{}:'.format(self._app_string)))
-        self.path_indicator = urwid.Text(('bright', ''), wrap='clip')
-        self.help_text = urwid.Text(self._help_string, wrap='clip', align='right')
-        # priority on showing full path
-        self.header_widget = urwid.Columns([
-            ('pack', self.header_prefix),
-            ('pack', self.path_indicator),
-            self.help_text
-        ], dividechars=1)
-
-        # footer
-        self.messagebox = urwid.Text('')
-        self.count_indicator = urwid.Text('', align='right')
-        self.footer_widget = urwid.Columns([
-            self.messagebox,
-            ('pack', urwid.AttrMap(self.count_indicator, 'border'))
-        ])
-
-        # some dynamic widgets
-        self.divider = urwid.AttrMap(urwid.Divider('-'), 'border')
-        self.preview = urwid.Filler(urwid.Text(''), valign='top')
-        self.editbox = urwid.Edit()
-
-        self.walker = urwid.SimpleListWalker(Pass.all_pass[''])
-        self.listbox = PassList(self.walker, ui=self)
-
-        # use Columns for horizonal layout, and Pile for vertical
-        if config.preview_layout in ['side', 'horizontal']:
-            self.middle = urwid.Columns([], dividechars=1)
-        elif config.preview_layout in ['bottom', 'vertical']:
-            self.middle = urwid.Pile([])
-        self.update_preview_layout()
-        self.update_view()
-
-        super().__init__(self.middle, self.header_widget, self.footer_widget)
-
-    def message(self, message, alert=False):
-        self.messagebox.set_text(('alert' if alert else 'normal',
-                                  message.replace('\n', ' ')))
-
-    def update_preview_layout(self):
-        if self._preview_shown:
-            if config.preview_layout in ['side', 'horizontal']:
-                self.middle.contents = [(self.listbox, ('weight', 1, False)),
-                                        (self.preview, ('weight', 1, False))]
-            if config.preview_layout in ['bottom', 'vertical']:
-                self.middle.contents = [(self.listbox, ('weight', 1)),
-                                        (self.divider, ('pack', 1)),
-                                        (self.preview, ('weight', 1))]
-            self.update_preview()
-        else:
-            self.middle.contents = [(self.listbox, ('weight', 1, False))]
-        self.middle.focus_position = 0
-
-    def mouse_event(self, size, event, button, col, row, focus):
-        logging.debug(f"ui mouse event: {size} {event} {button} {col} {row} {focus}")
-        # Prevent focus change due to clicking when editing
-        r = self.contents['footer'][0].rows(size[:1], True)
-        if self._edit_type is None or self._edit_type and row >= size[1] - r:
-            super().mouse_event(size, event, button, col, row, focus)
-
-    def keypress(self, size, key):
-        logging.debug("ui keypress: {} {}".format(key, size))
-        action = config.keybindings.get(key)
-        if action == 'cancel':
-            self.unfocus_edit()
-        elif self._edit_type == "copy":
-            self.unfocus_edit()
-            self.copy_by_key(key)
-        elif self._edit_type == "delete":
-            self.unfocus_edit()
-            self.delete_confirm(key)
-        elif self._edit_type is not None:
-            if action == 'confirm':
-                self.handle_input()
-            else:
-                # pass through to edit widget (the focused widget)
-                return super().keypress(size, key)
-        elif action == 'quit':
-            raise urwid.ExitMainLoop
-        elif action == 'search' or action == 'search_back':
-            self.focus_edit("search", '/' if action == 'search' else '?')
-            self._search_direction = 1 if action == 'search' else -1
-        elif action == 'search_next' or action == 'search_prev':
-            self.search_in_dir(self._search_pattern,
-                               1 if action == 'search_next' else -1)
-        elif action == 'insert':
-            self.focus_edit("insert", 'Enter password filename: ')
-        elif action == 'generate':
-            self.focus_edit("generate", 'Generate a password file: ')
-        elif action == 'edit' and not self.listbox.focus.isdir:
-            self.run_pass(Pass.edit, None,
-                          self.listbox.focus.node, self.listbox.root, "Edit: {}")
-            urwid.emit_signal(self, 'redraw')
-        elif action == 'delete' and not self.listbox.focus.empty:
-            self.focus_edit("delete", 'Are you sure to delete {} {}? [Y/n]'.format(
-                "the whole folder" if self.listbox.focus.isdir else "the file",
-                os.path.join('/', self.listbox.root, self.listbox.focus.node)
-            ))
-        elif action == 'copy':
-            self.copy_confirm()
-        elif action == 'toggle_preview':
-            self._preview_shown = not self._preview_shown
-            self.update_preview_layout()
-        else:
-            return super().keypress(size, key)
-
-    def unfocus_edit(self):
-        self._edit_type = None
-        self.contents['footer'] = (self.footer_widget, None)
-        self.set_focus('body')
-        self.messagebox.set_text('')
-        self.editbox.set_mask(None)
-
-    def focus_edit(self, edit_type, cap, mask=None):
-        self._edit_type = edit_type
-        self.contents['footer'] = (self.editbox, None)
-        self.set_focus('footer')
-        self.editbox.set_caption(cap)
-        self.editbox.set_mask(mask)
-        self.editbox.set_edit_text('')
-
-    def handle_input(self):
-        # these codes are ugly
-        edit_type = self._edit_type
-        self.unfocus_edit()
-        if edit_type == "search":
-            self._search_pattern = self.editbox.edit_text
-            self.search_in_dir(self._search_pattern, 1)
-        elif edit_type == "generate":
-            self.run_pass(Pass.generate, self.listbox.insert,
-                          self.editbox.edit_text, self.listbox.root, "Generate: {}")
-            self.listbox.update_root_count()
-        elif edit_type == "insert":
-            self._insert_node = self.editbox.edit_text
-            self.focus_edit("insert_password", 'Enter password: ', mask='*')
-        elif edit_type == "insert_password":
-            self._insert_pass = self.editbox.edit_text
-            self.focus_edit("insert_password_confirm", 'Enter password again: ', mask='*')
-        elif edit_type == "insert_password_confirm":
-            self._insert_pass_again = self.editbox.edit_text
-            if self._insert_pass == self._insert_pass_again:
-                self.run_pass(Pass.insert, self.listbox.insert,
-                              self._insert_node, self.listbox.root, "Insert: {}",
-                              args=(self._insert_pass,))
-                self.listbox.update_root_count()
-            else:
-                self.message("Password is not the same", alert=True)
+class StoreIndex(dict):
+    """
+    On-disk cache of the store listing, which maps folder paths to
+    (mtime, dirs, files). A folder is listed again only if its mtime changed.
+    Like the racy entries of git, a listing taken within RACY nanoseconds of
+    the mtime is not kept, since the folder may change again within the same
+    mtime.
 
-    def update_view(self):
-        # update header
-        self.path_indicator.set_text(('bright', "/" + self.listbox.root))
+    Only the folder and password names are kept, never any decrypted content.
+    """
+    VERSION = 2
+    RACY = 2 * 10**9
 
-        # update footer
-        self.count_indicator.set_text("{}/{}".format(
-            self.listbox.focus_position + 1,
-            len(self.listbox.body)
-        ) if not self.listbox.focus.empty else "0/0")
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.dirty = False
+        self.lock = threading.Lock()
 
-        self.update_preview()
+        DEFAULT_CACHE_DIR = os.path.join(os.getenv("HOME"), ".cache")
+        CACHE_DIR = os.getenv("XDG_CACHE_HOME", DEFAULT_CACHE_DIR)
+        # one index file for each password store
+        digest = hashlib.sha1(os.path.abspath(store).encode()).hexdigest()[:16]
+        self.path = os.path.join(CACHE_DIR, "cpass", "index-{}.json".format(digest))
 
-    def update_preview(self, force=False):
-        if not self._preview_shown:
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
             return
-
-        if not force and self.listbox.focus == self._last_preview:
+        # rebuild the index from scratch if the format changed
+        if data.get('version') != self.VERSION or data.get('store') != self.store:
             return
-        self._last_preview = self.listbox.focus
+        for root, (mtime, dirs, files) in data['folders'].items():
+            self[root] = (mtime, dirs, files)
 
-        if not self.listbox.focus.empty:
-            path = os.path.join(self.listbox.root, self.listbox.focus.node)
-            if self.listbox.focus.isdir:
-                preview = "\n".join([(f.icon + f.node) for f in Pass.all_pass[path]])
+    def save(self):
+        if not self.dirty:
+            return
+        with self.lock:
+            data = {'version': self.VERSION, 'store': self.store, 'folders': dict(self)}
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            # write to a temporary file first, so that the index is never half written
+            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(self.path),
+                                             delete=False) as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logging.warning("Can not save index {}: {}".format(self.path, e))
+
+    def listdir(self, root, scan):
+        """ return the cached listing if the folder is not modified, otherwise scan it """
+        try:
+            mtime = os.stat(os.path.join(self.store, root)).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        cached = self.get(root)
+        if cached is not None and cached[0] == mtime:
+            return list(cached[1]), list(cached[2])
+
+        dirs, files = scan(root) if mtime is not None else ([], [])
+        with self.lock:
+            if mtime is None or time.time_ns() - mtime < self.RACY:
+                self.pop(root, None)
             else:
-                res = Pass.show(path)
-                preview = res.stderr if res.returncode else res.stdout
-        else:
-            preview = ""
+                self[root] = (mtime, dirs, files)
+            self.dirty = True
+        return list(dirs), list(files)
 
-        self.preview.original_widget.set_text(preview)
 
-    def run_pass(self, func, lfunc, node, root, msg='', args=(), largs=()):
-        # do not accept password name ends with /, pass itself has problems
-        if node.endswith('/'):
-            self.message(f'Can not create a directory: {node}.', alert=True)
-            return
+class GitLog:
+    """
+    Last commit time and author of the passwords and folders, read from one
+    streamed 'git log --name-only' of the store, instead of a 'git log' for
+    each entry. It maps the paths, without the .gpg suffix, to (time, author),
+    a folder has the latest commit of all the passwords under it.
 
-        path = os.path.join(root, node)
-        res = func(path, *args)
-        if res.returncode == 0:
-            self.message(msg.format(path) if func != Pass.show else '')
-            if lfunc:
-                lfunc(node if lfunc == self.listbox.insert else largs[0])
-            # some operations like generating password need updating the preview
-            self.update_preview(True)
-        else:
-            self.message(res.stderr, alert=True)
+    The map is saved with the HEAD commit it is read at, when HEAD moves, only
+    the new commits are read, unless the history is rewritten.
+    """
+    VERSION = 1
 
-        return res
+    def __init__(self, store):
+        self.store = store
+        self.entries = {}
+        self.head = None
+        self.loaded = False
+        self.dirty = False
+        self.lock = threading.Lock()
 
-    def delete_confirm(self, key):
-        if key in ['y', 'Y', 'd', 'enter']:
-            self.run_pass(Pass.delete, self.listbox.delete,
-                          self.listbox.focus.node, self.listbox.root,
-                          "Deleting {}", largs=(self.listbox.focus_position,))
-            # TODO: put this into lower level functions
-            self.listbox.update_root_count()
-        elif key in ['n', 'N']:
-            self.message("Abort.")
-        else:
-            self.message("Invalid option.", alert=True)
+        DEFAULT_CACHE_DIR = os.path.join(os.getenv("HOME"), ".cache")
+        CACHE_DIR = os.getenv("XDG_CACHE_HOME", DEFAULT_CACHE_DIR)
+        digest = hashlib.sha1(os.path.abspath(store).encode()).hexdigest()[:16]
+        self.path = os.path.join(CACHE_DIR, "cpass", "git-{}.json".format(digest))
 
-    def parse_pass(self, passwd):
-        # TODO: mark numbers on the side
+    def get(self, path):
+        return self.entries.get(path)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != self.VERSION or data.get('store') != self.store:
+            return
+        self.head = data['head']
+        self.entries = {p: tuple(e) for p, e in data['entries'].items()}
+
+    def save(self):
+        if not self.dirty:
+            return
+        with self.lock:
+            data = {'version': self.VERSION, 'store': self.store, 'head': self.head,
+                    'entries': self.entries}
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(self.path),
+                                             delete=False) as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logging.warning("Can not save git log {}: {}".format(self.path, e))
+
+    def git(self, *args):
+        return run(['git', '-C', self.store, *args], stdout=PIPE, stderr=DEVNULL, text=True)
+
+    def update(self):
         """
-        parse the decryped content of the password file
-        and relate shortcut keys to the corrsponding texts
+        read the commits since the last update, or the whole history, return
+        whether anything changed, safe to call from worker threads
         """
-        lines = passwd.split('\n')
-        # 1. default: yy to copy first line, ya to copy all lines
-        copiable_fields = {'a': passwd, 'y': lines[0], '1': lines[0]}
+        # only called from the one worker of the 'git' pool, see cpass_tui
+        if not self.loaded:
+            self.load()
+            self.loaded = True
+        res = self.git('rev-parse', '--verify', '-q', 'HEAD')
+        head = res.stdout.strip() if res.returncode == 0 else None
+        if head is None or head == self.head:
+            return False
+
+        since = self.head
+        if since is not None and self.git('merge-base', '--is-ancestor',
+                                          since, head).returncode != 0:
+            # the history is rewritten, e.g. rebased
+            since = None
+        logging.debug("Reading git log of %s since %s", head, since)
+        entries = self.read(head if since is None else since + '..' + head)
+        if entries is None:
+            return False
+        with self.lock:
+            if since is None:
+                self.entries = entries
+            else:
+                # the new commits are the latest
+                self.entries = dict(self.entries, **entries)
+            self.head = head
+            self.dirty = True
+        return True
+
+    def read(self, revisions):
+        """ map the paths and their folders to their latest commits in the revisions """
+        entries = {}
+        command = ['git', '-C', self.store, '-c', 'core.quotePath=false', 'log',
+                   '--name-only', '--format=%x01%ct %an', revisions, '--']
+        commit = None
+        # the newest commits come first, the first one of a path is its latest
+        with Popen(command, stdout=PIPE, stderr=DEVNULL, text=True,
+                   errors='replace') as proc:
+            for line in proc.stdout:
+                line = line.rstrip('\n')
+                if line.startswith('\x01'):
+                    timestamp, _, author = line[1:].partition(' ')
+                    commit = (int(timestamp), sys.intern(author))
+                elif line.endswith('.gpg') and commit is not None:
+                    path = line[:-4]
+                    # the folders are newer already if they are seen
+                    while path not in entries:
+                        entries[path] = commit
+                        if not path:
+                            break
+                        path = os.path.dirname(path)
+        return entries if proc.returncode == 0 else None
+
+
+class PlainCache:
+    """
+    Bounded LRU cache of decrypted password contents, kept in memory only.
+    Entries expire after ttl seconds, or their own ttl if given, e.g. the
+    prefetched ones. A size of 0 disables the cache.
+    """
+    def __init__(self, size=0, ttl=60):
+        self.size = size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        # the preview is decrypted in worker threads
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            self._expire()
+            if path not in self._items:
+                return None
+            self._items.move_to_end(path)
+            return self._items[path][1]
+
+    def put(self, path, content, ttl=None):
+        if self.size <= 0:
+            return
+        with self._lock:
+            expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._items[path] = (expires, content)
+            self._items.move_to_end(path)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, path):
+        """ drop the cached password, or all passwords under it if it is a folder """
+        with self._lock:
+            for p in [p for p in self._items if p == path or p.startswith(path + '/')]:
+                del self._items[p]
+
+    def _expire(self):
+        now = time.monotonic()
+        for p in [p for p, (t, _) in self._items.items() if t < now]:
+            del self._items[p]
+
+
+class Otp:
+    """
+    One time passwords of an otpauth:// URI, in the format of pass-otp. The
+    codes are computed here, HOTP of RFC 4226 and TOTP of RFC 6238, instead of
+    running 'pass otp' and decrypting the password for each code.
+    """
+    DIGESTS = {'SHA1': 'sha1', 'SHA256': 'sha256', 'SHA512': 'sha512'}
+
+    def __init__(self, uri):
+        import base64
+        from urllib.parse import urlsplit, parse_qs
+        url = urlsplit(uri)
+        params = {k.lower(): v[-1] for k, v in parse_qs(url.query).items()}
+        if (url.scheme != 'otpauth' or url.netloc not in ['totp', 'hotp']
+                or 'secret' not in params):
+            raise ValueError("not a totp or hotp URI")
+        self.type = url.netloc
+        secret = params['secret'].upper().replace(' ', '').rstrip('=')
+        # binascii.Error is a ValueError as well
+        self.secret = base64.b32decode(secret + '=' * (-len(secret) % 8))
+        self.digest = self.DIGESTS.get(params.get('algorithm', 'SHA1').upper())
+        if self.digest is None:
+            raise ValueError("unknown algorithm {}".format(params['algorithm']))
+        self.digits = int(params.get('digits', '6'))
+        self.period = int(params.get('period', '30'))
+        self.counter = int(params.get('counter', '0'))
+        if self.period <= 0 or not 1 <= self.digits <= 10:
+            raise ValueError("invalid period or digits")
 
-        for i in range(1, len(lines)):
-            field, sep, value = [s.strip() for s in lines[i].partition(':')]
-            # 2. y[0-9] to copy that line, right of colon if applicable
-            if i < 10:
-                copiable_fields[str(i + 1)[-1]] = value if sep == ':' else field
-            # 3. customized field shortcuts
-            if sep == ':' and field in config.copy_bindings:
-                copiable_fields[config.copy_bindings[field]] = value
+    @classmethod
+    def parse(cls, passwd):
+        """ the Otp of the first otpauth:// line, None if there is none """
+        for line in passwd.split('\n'):
+            if line.strip().startswith('otpauth://'):
+                return cls(line.strip())
+        return None
+
+    def hotp(self, counter):
+        mac = hmac.new(self.secret, counter.to_bytes(8, 'big'), self.digest).digest()
+        offset = mac[-1] & 0x0f
+        code = int.from_bytes(mac[offset:offset + 4], 'big') & 0x7fffffff
+        return str(code % 10 ** self.digits).zfill(self.digits)
+
+    def now(self, now=None):
+        """
+        the current code and the seconds it is still valid, which is None for
+        HOTP, its code is of the stored counter, which is not advanced here
+        """
+        if self.type == 'hotp':
+            return self.hotp(self.counter), None
+        now = time.time() if now is None else now
+        return self.hotp(int(now // self.period)), self.period - int(now % self.period)
 
-        return copiable_fields
 
-    def copy_confirm(self):
-        if self.listbox.focus.isdir:
-            return
-        if self._preview_shown:
-            password = self.preview.original_widget.text
-        else:
-            res = self.run_pass(Pass.show, None, self.listbox.focus.node, self.listbox.root)
-            if res.returncode == 0:
-                password = res.stdout
-            else:
-                return
+class Audit:
+    """
+    Health of the passwords, whether they are weak, reused or old. Whether two
+    passwords are the same is told by a keyed hash, whose random key lives in
+    memory only, so the hashes are of no use to anyone else.
 
-        pw = self.parse_pass(password.rstrip('\n'))
-        self.focus_edit("copy", 'Copy [{}]: '.format(''.join(sorted(pw))))
-        self._parsed_password = pw
-
-    def copy_by_key(self, key):
-        if key in self._parsed_password:
-            copy_text = self._parsed_password[key]
-            # stderr and stdout have to be dropped, otherwise the program is stuck
-            res = run(['xclip', '-selection', Pass.X_SELECTION],
-                      text=True, input=copy_text, stderr=DEVNULL, stdout=DEVNULL)
-            if res.returncode == 0:
-                self.message("Copied.")
-            else:
-                self.message("Copy with xclip failed", alert=True)
-        else:
-            self.message("Nothing copied", alert=True)
+    The results are kept by the modification time of the password files, so
+    that auditing again only decrypts the changed passwords.
+    """
+    # bits of entropy for the scores 1 to 4, roughly like zxcvbn
+    SCORES = [30, 45, 60, 80]
 
-    def search_in_dir(self, pattern, direction):
-        """ direction = 1 or -1 to specify the search direction """
-        if pattern is None:
-            self.message("No search pattern", alert=True)
-            return
+    def __init__(self):
+        self.key = os.urandom(32)
+        self.results = {}  # path -> (mtime, digest, score)
 
-        # search from the next/previous, wrap if reaching bottom/top
-        start = self.listbox.focus_position
-        direction *= self._search_direction
-        # list of indexes according to the start point and order
-        indexes = list(range(len(self.listbox.body)))
-        # the math here is kind of magic, it's the result after simplification
-        search_list = (indexes[start+direction::direction] +
-                       indexes[:start+direction:direction])
-
-        for i in search_list:
-            node = self.listbox.body[i].node
-            # ignore case if all letters are lower case
-            if pattern == pattern.lower():
-                node = node.lower()
-
-            # search for all space separated words
-            if all([s in node for s in pattern.split()]):
-                self.listbox.list_navigate(new_focus=i)
-                return
+    def check(self, path):
+        """
+        (digest, score) of a password, decrypted unless unchanged since the
+        last check, safe to call from worker threads
+        """
+        mtime = os.stat(os.path.join(Pass.PASS_DIR, path + '.gpg')).st_mtime_ns
+        result = self.results.get(path)
+        if result is not None and result[0] == mtime:
+            return result[1:]
+
+        res = Pass.show(path)
+        if res.returncode != 0:
+            raise RuntimeError(res.stderr)
+        # the same fields as the copy shortcuts, the password is the first line
+        passwd = res.stdout.split('\n')[0]
+        words = [v for v in Pass.parse_fields(res.stdout).values()
+                 if not v.startswith('otpauth:')]
+        words += path.split('/')
+        digest = hmac.new(self.key, passwd.encode(), 'sha256').digest() if passwd else None
+        self.results[path] = (mtime, digest, self.score(passwd, words))
+        return self.results[path][1:]
+
+    def changed(self, path):
+        """ time of the last change, the last commit if known, or of the file """
+        entry = Pass.gitlog.get(path) if Pass.gitlog is not None else None
+        return entry[0] if entry else self.results[path][0] / 1e9
+
+    def prune(self, paths):
+        """ forget the passwords no longer in the store """
+        paths = set(paths)
+        for p in [p for p in self.results if p not in paths]:
+            del self.results[p]
 
-        self.message("No matching", alert=True)
+    @classmethod
+    def score(cls, passwd, words=()):
+        """
+        strength from 0 (very weak) to 4 (strong), by the bits of entropy of the
+        length and the character classes. Repeated and sequential characters,
+        and the words of the entry like the login or the name, do not count.
+        """
+        rest = passwd.lower()
+        for word in sorted(words, key=len, reverse=True):
+            if len(word) >= 3:
+                rest = rest.replace(word.lower(), '\0')
+        length = sum(1 for i, c in enumerate(rest)
+                     if c != '\0' and (i == 0 or abs(ord(c) - ord(rest[i - 1])) > 1))
+        pool = sum(size for size, chars in [
+            (26, str.islower), (26, str.isupper), (10, str.isdigit),
+            (33, lambda c: not c.isalnum())] if any(chars(c) for c in passwd))
+        bits = length * math.log2(pool) if pool > 1 else 0
+        return bisect.bisect(cls.SCORES, bits)
+
+
+class PassBackend:
+    """ read passwords with `pass show` """
+    def show(self, path):
+        return run(['pass', 'show', path], stdout=PIPE, stderr=PIPE, text=True)
+
+
+class GpgBackend:
+    """
+    Read passwords by calling gpg directly, which skips the forks in the `pass`
+    bash script. The gpg options are the same as what pass uses, including
+    $PASSWORD_STORE_GPG_OPTS, except that --batch is always used since gpg
+    can not prompt on the terminal occupied by cpass (pinentry still works).
+    """
+    def __init__(self):
+        self.gpg = 'gpg2' if shutil.which('gpg2') else 'gpg'
+        self.opts = os.getenv('PASSWORD_STORE_GPG_OPTS', '').split() + [
+            '--quiet', '--yes', '--compress-algo=none', '--no-encrypt-to',
+            '--batch', '--use-agent']
+        self.env = dict(os.environ)
+        if 'GPG_TTY' not in self.env and os.isatty(0):
+            self.env['GPG_TTY'] = os.ttyname(0)
+
+    def show(self, path):
+        passfile = os.path.join(Pass.PASS_DIR, path + '.gpg')
+        command = [self.gpg, '-d', *self.opts, passfile]
+        # the same checks as `pass show`
+        if re.search(r'(^|/)\.\.(/|$)', path):
+            return CompletedProcess(command, 1, '', "Error: You've attempted "
+                                    "to pass a sneaky path to pass. Go home.\n")
+        if not os.path.isfile(passfile):
+            return CompletedProcess(
+                command, 1, '', "Error: {} is not in the password store.\n".format(path))
+        return run(command, stdout=PIPE, stderr=PIPE, text=True, env=self.env)
+
+    def encrypt(self, passfile, content, recipients):
+        """
+        encrypt the content to the recipients into a temporary file, which then
+        replaces the password file, so it is never half written
+        """
+        os.makedirs(os.path.dirname(passfile), exist_ok=True)
+        fd, temp = tempfile.mkstemp(prefix=os.path.basename(passfile) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(passfile))
+        os.close(fd)
+        command = [self.gpg, '-e', *[a for r in recipients for a in ('-r', r)],
+                   '-o', temp, *self.opts]
+        res = run(command, input=content, stdout=PIPE, stderr=PIPE, env=self.env)
+        if res.returncode != 0:
+            os.remove(temp)
+            return CompletedProcess(command, res.returncode, '',
+                                    res.stderr.decode(errors='replace'))
+        os.replace(temp, passfile)
+        return CompletedProcess(command, 0, '', '')
 
 
 class Pass:
     FALLBACK_PASS_DIR = os.path.join(os.getenv("HOME"), ".password_store")
     PASS_DIR = os.getenv("PASSWORD_STORE_DIR", FALLBACK_PASS_DIR)
     X_SELECTION = os.getenv("PASSWORD_STORE_X_SELECTION", "clipboard")
+    CLIP_TIME = 45  # or $PASSWORD_STORE_CLIP_TIME, see setup
     EDITOR = os.getenv("EDITOR", "vi")
-    all_pass = dict()
-    # exit if pass dir does not exit
-    if not os.path.exists(PASS_DIR):
-        print("'{}' or $PASSWORD_STORE_DIR does not exist".format(FALLBACK_PASS_DIR))
-        print("See `man pass` for how to set password storage directory.")
-        exit()
+    all_pass = PassTree()
+    finder = FindIndex()
+    # inotify watcher, if available
+    watcher = None
+    # last commits of the passwords, if the git column is shown
+    gitlog = None
+    audit = Audit()
+    # password paths collected by extract_all for the finder
+    paths = []
+    # (direct, recursive) counts of the folders not scanned yet, see PassNode.update_count
+    counts = dict()
+    index = StoreIndex(PASS_DIR)
+    cache = PlainCache()
+    # parsed one time password secrets, see Pass.otp
+    otps = PlainCache()
+    backend = PassBackend()
+    backends = {'pass': PassBackend, 'gpg': GpgBackend}
+
+    @classmethod
+    def extract_all(cls, root=''):
+        # pass files traversal, children folders are extracted before their
+        # parent, which is essential, see PassNode
+        dirs, files = cls.listdir(root)
+        for d in dirs:
+            # do not follow symbolic links, just like os.walk
+            if not os.path.islink(os.path.join(cls.PASS_DIR, root, d)):
+                cls.extract_all(os.path.join(root, d))
+        # plain concatenation, os.path.join is too slow for every password
+        prefix = root + '/' if root else ''
+        cls.paths.extend([prefix + f for f in files])
+        cls.add_folder(root, dirs, files)
+
+    @classmethod
+    def add_folder(cls, root, dirs, files):
+        folder = Folder(root, dirs, files)
+        # the subtree total is known if all the sub-folders are scanned, which
+        # extract_all guarantees, symbolic links are not followed and count 0
+        folder.total = len(files)
+        for d in dirs:
+            path = os.path.join(root, d)
+            # NOTE: dict.get does not trigger scanning, see PassTree
+            child = dict.get(cls.all_pass, path)
+            if child is not None and child.total is not None:
+                folder.total += child.total
+            elif not os.path.islink(os.path.join(cls.PASS_DIR, path)):
+                folder.total = None
+                break
+        cls.all_pass[root] = folder
+        if cls.watcher:
+            cls.watcher.watch(root)
+        return folder
+
+    @classmethod
+    def add_total(cls, root, delta):
+        """ change the password total of a folder and all its parents, O(depth) """
+        while True:
+            folder = dict.get(cls.all_pass, root)
+            if folder is not None and folder.total is not None:
+                folder.total += delta
+            # counted in background before, count again when needed
+            cls.counts.pop(root, None)
+            if not root:
+                break
+            root = os.path.dirname(root)
+
+    @classmethod
+    def scan(cls, root):
+        """
+        scan the sub-folders not scanned yet under a folder, until its total is
+        known
+        """
+        folder = cls.all_pass[root]
+        if folder.total is None:
+            total = folder.count - folder.ndirs
+            for name in folder.names[:folder.ndirs]:
+                path = os.path.join(root, name)
+                if not os.path.islink(os.path.join(cls.PASS_DIR, path)):
+                    total += cls.scan(path).total
+            folder.total = total
+        return folder
+
+    @classmethod
+    def new_total(cls, root, name, isdir):
+        """
+        number of passwords under a new entry of a folder, the entry is scanned
+        if the folder total is known, which needs the sub-folder totals
+        """
+        path = os.path.join(root, name)
+        if not isdir:
+            return 1
+        if (cls.all_pass[root].total is None
+                or os.path.islink(os.path.join(cls.PASS_DIR, path))):
+            # the totals of the parents are unknown as well, or not counted
+            return 0
+        return cls.scan(path).total
+
+    @classmethod
+    def old_total(cls, path, isdir):
+        """ number of passwords under a removed entry, from the scanned folders """
+        if not isdir:
+            return 1
+        # known if the parent total is known, see new_total
+        folder = dict.get(cls.all_pass, path)
+        return folder.total if folder is not None and folder.total is not None else 0
+
+    @classmethod
+    def add_entry(cls, root, name, isdir=False):
+        """ add a name to a folder, scanned if needed, and update the totals """
+        folder = cls.all_pass[root]
+        pos = folder.position(name, isdir)
+        if pos is not None:
+            return pos
+        pos = folder.insert(name, isdir)
+        cls.add_total(root, cls.new_total(root, name, isdir))
+        return pos
+
+    @classmethod
+    def add_path(cls, path, isdir=False):
+        """ add a path and its missing parent folders, return its position """
+        root, name = os.path.split(path)
+        if root:
+            cls.add_path(root, True)
+        return cls.add_entry(root, name, isdir)
+
+    @classmethod
+    def remove_entry(cls, root, pos):
+        """ remove the name at the position of a folder, and update the totals """
+        name, isdir = cls.all_pass[root].entry(pos)
+        path = os.path.join(root, name)
+        cls.all_pass[root].pop(pos)
+        cls.add_total(root, -cls.old_total(path, isdir))
+        if isdir:
+            cls.forget(path)
+        return name, isdir
+
+    @classmethod
+    def forget(cls, root):
+        """ drop the scanned folders under a removed folder """
+        for path in [p for p in cls.all_pass if p == root or p.startswith(root + '/')]:
+            del cls.all_pass[path]
+            cls.counts.pop(path, None)
+            if cls.watcher:
+                cls.watcher.unwatch(path)
+
+    @classmethod
+    def rekey(cls, src, dst):
+        """
+        move the scanned folders under a moved folder to the new paths, following
+        the sub-folder names, so that the time is proportional to the subtree
+        """
+        stack = [(src, dst)]
+        missed = False
+        while stack:
+            old, new = stack.pop()
+            cls.counts.pop(old, None)
+            folder = cls.all_pass.pop(old, None)
+            if folder is None:
+                missed = True
+                continue
+            folder.path = sys.intern(new)
+            cls.all_pass[new] = folder
+            if cls.watcher:
+                cls.watcher.move(old, new)
+            stack.extend((os.path.join(old, d), os.path.join(new, d))
+                         for d in folder.names[:folder.ndirs])
+        if missed:
+            # a folder found with the finder is scanned without its parents
+            for path in [p for p in cls.all_pass if p.startswith(src + '/')]:
+                cls.rekey(path, dst + path[len(src):])
+
+    @classmethod
+    def moved(cls, src, dst, isdir, copy=False):
+        """
+        apply a move or copy of a password or folder, done by pass, to the
+        scanned folders without scanning the moved ones again. Return the
+        position of the destination in its folder.
+        """
+        cls.invalidate(dst)
+        if not copy:
+            cls.invalidate(src)
+            cls.finder.remove(src)
+            root, name = os.path.split(src)
+            # NOTE: dict.get does not trigger scanning, see PassTree
+            folder = dict.get(cls.all_pass, root)
+            pos = folder.position(name, isdir) if folder is not None else None
+            if pos is not None:
+                folder.pop(pos)
+                cls.add_total(root, -cls.old_total(src, isdir))
+            if isdir:
+                cls.rekey(src, dst)
+        for p in cls.walk(dst) if isdir else [dst]:
+            cls.finder.add(p)
+        return cls.add_path(dst, isdir)
+
+    @classmethod
+    def refresh(cls, changes):
+        """
+        list the changed folders again and apply the differences, changes maps
+        folders to the changed names within, see Watcher.read
+        """
+        for root, names in changes.items():
+            # the modified passwords are outdated in the cache
+            for name in names:
+                if name.endswith('.gpg'):
+                    cls.invalidate(os.path.join(root, name[:-4]))
+            if root not in cls.all_pass:
+                continue
+
+            added, removed = cls.all_pass[root].update(*cls.listdir(root))
+            delta = 0
+            for name, isdir in removed:
+                path = os.path.join(root, name)
+                cls.finder.remove(path)
+                delta -= cls.old_total(path, isdir)
+                if isdir:
+                    cls.forget(path)
+            for name, isdir in added:
+                path = os.path.join(root, name)
+                for p in cls.walk(path) if isdir else [path]:
+                    cls.finder.add(p)
+                delta += cls.new_total(root, name, isdir)
+            if added or removed:
+                cls.add_total(root, delta)
+
+    @classmethod
+    def walk(cls, root=''):
+        """ iterate over all password paths under a folder, without creating Folders """
+        for folder, files in cls.walk_folders(root):
+            prefix = folder + '/' if folder else ''
+            for f in files:
+                yield prefix + f
+
+    @classmethod
+    def walk_folders(cls, root=''):
+        """ iterate over (folder, password names) of a folder and all under it """
+        dirs, files = cls.listdir(root)
+        for d in dirs:
+            if not os.path.islink(os.path.join(cls.PASS_DIR, root, d)):
+                yield from cls.walk_folders(os.path.join(root, d))
+        yield root, files
+
+    @classmethod
+    def build_finder(cls):
+        """ build the finder index, reuse the paths of extract_all if possible """
+        return FindIndex(cls.paths or cls.walk()).finish()
+
+    @classmethod
+    def set_finder(cls, finder):
+        """ use the index built in background, with the changes made while building it """
+        finder.apply(cls.finder.changes)
+        cls.finder = finder
+
+    @classmethod
+    def listdir(cls, root):
+        """ list the sub-folders and password names of a folder in the store """
+        return cls.index.listdir(root, cls.scandir)
+
+    @classmethod
+    def scandir(cls, root):
+        dirs, files = [], []
+        try:
+            with os.scandir(os.path.join(cls.PASS_DIR, root)) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if entry.name != '.git':
+                            dirs.append(entry.name)
+                    elif entry.name.endswith('.gpg'):
+                        files.append(entry.name[:-4])
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        return dirs, files
+
+    @classmethod
+    def count(cls, root, recursive=False):
+        """
+        (direct, recursive) numbers of entries and passwords in a folder, the
+        recursive one is None unless asked, safe to call from worker threads
+        """
+        dirs, files = cls.listdir(root)
+        total = None
+        if recursive:
+            total = sum(len(files) for _, files in cls.walk_folders(root))
+        cls.counts[root] = (len(dirs) + len(files), total)
+        return cls.counts[root]
+
+    @classmethod
+    def show(cls, path, ttl=None):
+        """ decrypt a password, or take it from the cache, ttl overrides the cache ttl """
+        command = ['pass', 'show', path]
+        content = cls.cache.get(path)
+        if content is not None:
+            return CompletedProcess(command, 0, content, '')
+
+        logging.debug("Showing password for %s", path)
+        res = cls.backend.show(path)
+        if res.returncode == 0:
+            cls.cache.put(path, res.stdout, ttl)
+        return res
+
+    @classmethod
+    def otp(cls, path, passwd):
+        """
+        the Otp of a decrypted password, None if it has none. It is kept for
+        the otp_ttl seconds, so that the codes are computed without the content.
+        Raise ValueError if the otpauth URI is invalid.
+        """
+        otp = cls.otps.get(path)
+        if otp is None:
+            otp = Otp.parse(passwd)
+            if otp is not None:
+                cls.otps.put(path, otp)
+        return otp
 
     @classmethod
-    def extract_all(cls):
-        # pass files traversal, topdown option is essential, see PassNode
-        for root, dirs, files in os.walk(cls.PASS_DIR, topdown=False):
-            if not root.startswith(os.path.join(cls.PASS_DIR, '.git')):
-                root = os.path.normpath(os.path.relpath(root, cls.PASS_DIR)).lstrip('.')
-                dirs = [d for d in dirs if d != '.git']
-                files = [file[:-4] for file in files if file.endswith('.gpg')]
-                # NOTE: all_pass, FolderWalker, PassNode references are in a cycle.
-                cls.all_pass[root] = FolderWalker(root, dirs, files)
+    def invalidate(cls, path):
+        """ drop the cached content and secret of a password, or all under a folder """
+        cls.cache.invalidate(path)
+        cls.otps.invalidate(path)
 
     @staticmethod
-    def show(path):
-        logging.debug("Showing password for {}".format(path))
-        return run(['pass', 'show', path], stdout=PIPE, stderr=PIPE, text=True)
+    def parse_fields(passwd):
+        """ fields in the lines after the password line, in the form of 'field: value' """
+        fields = {}
+        for line in passwd.split('\n')[1:]:
+            field, sep, value = [s.strip() for s in line.partition(':')]
+            if sep == ':':
+                fields[field] = value
+        return fields
+
+    @classmethod
+    def match(cls, passwd, query):
+        """
+        whether the decrypted content contains all the space separated words of
+        the query. A word like 'field:value' matches the value of that field,
+        if the field exists. Case is ignored if all letters are lower case.
+        """
+        ignore_case = query == query.lower()
+        fold = str.lower if ignore_case else str
+        fields = {f.lower(): fold(v) for f, v in cls.parse_fields(passwd).items()}
+        content = fold(passwd)
+
+        for word in query.split():
+            field, sep, value = word.partition(':')
+            if sep and field.lower() in fields:
+                if fold(value) not in fields[field.lower()]:
+                    return False
+            elif fold(word) not in content:
+                return False
+        return True
+
+    @classmethod
+    def search(cls, path, query):
+        """ decrypt and match the password, the content never leaves the memory """
+        res = cls.show(path)
+        if res.returncode != 0:
+            raise RuntimeError(res.stderr)
+        return cls.match(res.stdout, query)
 
     @classmethod
     def edit(cls, path):
@@ -604,16 +1271,627 @@ class Pass:
             command.append('-n')
         return run(command, stdout=PIPE, stderr=PIPE, text=True)
 
+    @classmethod
+    def generate_file(cls, path):
+        """
+        like generate, but with gpg directly and without a commit, for the bulk
+        operations, which commit all the passwords at once, see git_commit.
+        pass itself always commits, and concurrent commits fail on the git lock.
+        """
+        if os.getenv('PASSWORD_STORE_SIGNING_KEY'):
+            # pass verifies the signature of .gpg-id in that case, which is not done here
+            return CompletedProcess(path, 1, '', "PASSWORD_STORE_SIGNING_KEY is set")
+        _, recipients = cls.gpg_id(os.path.dirname(path))
+        if not recipients:
+            return CompletedProcess(path, 1, '', "no .gpg-id found for {}".format(path))
+        try:
+            length = int(os.getenv('PASSWORD_STORE_GENERATED_LENGTH', '25'))
+        except ValueError:
+            length = 25
+        chars = string.ascii_letters + string.digits
+        if not config.no_symbols:
+            chars += string.punctuation
+        password = ''.join(secrets.choice(chars) for _ in range(length))
+        gpg = cls.backend if isinstance(cls.backend, GpgBackend) else GpgBackend()
+        return gpg.encrypt(os.path.join(cls.PASS_DIR, path + '.gpg'),
+                           (password + '\n').encode(), recipients)
+
+    @staticmethod
+    def move(src, dst):
+        command = ['pass', 'mv', '-f', src, dst]
+        return run(command, stdout=PIPE, stderr=PIPE, text=True)
+
+    @staticmethod
+    def copy(src, dst):
+        command = ['pass', 'cp', '-f', src, dst]
+        return run(command, stdout=PIPE, stderr=PIPE, text=True)
+
+    @classmethod
+    def destination(cls, src, root, node):
+        """
+        the path src is moved or copied to, given the node typed in the folder
+        root. Like pass, it goes into the node if that is a folder.
+        """
+        path = os.path.normpath(os.path.join('/', root, node)).lstrip('/')
+        if (not path or node.endswith('/')
+                or os.path.isdir(os.path.join(cls.PASS_DIR, path))):
+            path = os.path.join(path, os.path.basename(src))
+        return path
+
     @staticmethod
     def delete(path):
         command = ['pass', 'rm', '-r', '-f', path]
         return run(command, stdout=PIPE, stderr=PIPE, text=True)
 
+    @classmethod
+    def delete_file(cls, path):
+        """
+        like delete, but without pass and without a commit, see generate_file.
+        Like pass, a path ending with '/' is a folder, and the folders left
+        empty are removed too.
+        """
+        passdir = os.path.join(cls.PASS_DIR, path.rstrip('/'))
+        passfile = passdir + '.gpg'
+        try:
+            if path.endswith('/') or not os.path.isfile(passfile):
+                shutil.rmtree(passdir)
+            else:
+                os.remove(passfile)
+            folder = os.path.dirname(passdir)
+            while folder != os.path.normpath(cls.PASS_DIR) and not os.listdir(folder):
+                os.rmdir(folder)
+                folder = os.path.dirname(folder)
+        except OSError as e:
+            return CompletedProcess(path, 1, '', str(e))
+        return CompletedProcess(path, 0, '', '')
+
+    @classmethod
+    def gpg_id(cls, folder):
+        """ (path of the nearest .gpg-id, recipients) of a folder, like pass finds them """
+        if os.getenv('PASSWORD_STORE_KEY'):
+            return None, tuple(os.getenv('PASSWORD_STORE_KEY').split())
+        path = os.path.join(folder, '.gpg-id')
+        if os.path.isfile(os.path.join(cls.PASS_DIR, path)):
+            with open(os.path.join(cls.PASS_DIR, path)) as f:
+                recipients = [line.split('#')[0].strip() for line in f]
+            return path, tuple(r for r in recipients if r)
+        if folder:
+            return cls.gpg_id(os.path.dirname(folder))
+        return None, ()
 
-class MyConfigParser(configparser.RawConfigParser):
+    @classmethod
+    def git_commit(cls, files, message):
+        """
+        commit the changes of all the files at once, the files are relative to
+        the store, i.e. passwords with the .gpg suffix, or folders.
+        Return None if the store is not a git repository.
+        """
+        if not files or not os.path.isdir(os.path.join(cls.PASS_DIR, '.git')):
+            return None
+        present = [f for f in files if os.path.lexists(os.path.join(cls.PASS_DIR, f))]
+        removed = sorted(set(files) - set(present))
+        # git add fails on the removed files which were never committed
+        unstage = ['rm', '-r', '-q', '--cached', '--ignore-unmatch']
+        for command, paths in [(['add', '-A'], present), (unstage, removed)]:
+            if not paths:
+                continue
+            # through stdin, the command line is too short for a whole store
+            res = run(['git', '-C', cls.PASS_DIR, *command, '--pathspec-from-file=-',
+                       '--pathspec-file-nul'], input='\0'.join(paths),
+                      stdout=PIPE, stderr=PIPE, text=True)
+            if res.returncode != 0:
+                return res
+        if run(['git', '-C', cls.PASS_DIR, 'diff', '--cached', '--quiet']).returncode == 0:
+            return None
+        return run(['git', '-C', cls.PASS_DIR, 'commit', '-m', message],
+                   stdout=PIPE, stderr=PIPE, text=True)
+
+
+class Dispatcher:
+    """
+    Run jobs in background thread pools and deliver the results back to the
+    urwid main loop through a pipe, since widgets are not thread safe.
+
+    Jobs can be submitted before the main loop is attached, the results are
+    then delivered once the main loop starts. The pipe and the pools are only
+    created when first needed, the commands in main() do not use them.
+    """
+    def __init__(self):
+        self._pools = {}
+        self._results = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._results is not None:
+            return
+        with self._lock:
+            if self._results is not None:
+                return
+            import queue
+            self._read_fd, self._write_fd = os.pipe()
+            os.set_blocking(self._write_fd, False)
+            self._results = queue.SimpleQueue()
+
+    def attach(self, mainloop):
+        self._open()
+        mainloop.watch_file(self._read_fd, self._dispatch)
+
+    def submit(self, pool, func, *args, callback=None, workers=1):
+        """
+        run func(*args) in the named pool, callback is called in the main loop
+        with the finished future, unless the future is cancelled
+        """
+        self._open()
+        if pool not in self._pools:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pools[pool] = ThreadPoolExecutor(workers, thread_name_prefix=pool)
+        future = self._pools[pool].submit(func, *args)
+        if callback:
+            future.add_done_callback(
+                lambda f: f.cancelled() or self.call_soon(callback, f))
+        return future
+
+    def call_soon(self, func, *args):
+        """ schedule func(*args) in the main loop, can be called from any thread """
+        self._open()
+        self._results.put((func, args))
+        try:
+            os.write(self._write_fd, b'.')
+        except BlockingIOError:
+            # the pipe is full, there are pending wake-ups already
+            pass
+
+    def _dispatch(self):
+        os.read(self._read_fd, 4096)
+        while not self._results.empty():
+            func, args = self._results.get_nowait()
+            try:
+                func(*args)
+            except Exception:
+                logging.exception("background job callback failed")
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class Batch:
+    """
+    Run a function over many items in a bounded worker pool. Only a few jobs
+    are queued at a time, the next ones are submitted as the previous ones
+    finish, so that the batch can be cancelled quickly.
+
+    callback(item, future) is called in the main loop for each finished item,
+    and done() after all the items are finished.
+    """
+    def __init__(self, pool, func, items, callback, done=None, args=(), workers=4):
+        self.pool = pool
+        self.func = func
+        self.args = args
+        self.items = iter(items)
+        self.callback = callback
+        self.done = done
+        self.workers = max(1, workers)
+        self.pending = 0
+        self.finished = 0
+        self.failed = 0
+        self.cancelled = False
+
+    def start(self):
+        for _ in range(self.workers * 2):
+            self._submit()
+        if self.pending == 0 and self.done:
+            self.done()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _submit(self):
+        for item in self.items:
+            self.pending += 1
+            dispatcher.submit(self.pool, self.func, item, *self.args, workers=self.workers,
+                              callback=lambda f, item=item: self._finish(item, f))
+            return True
+        return False
+
+    def _finish(self, item, future):
+        self.pending -= 1
+        if self.cancelled:
+            return
+        self.finished += 1
+        if future.exception() is not None:
+            self.failed += 1
+            logging.debug("%s failed: %s", item, future.exception())
+        try:
+            self.callback(item, future)
+        finally:
+            # a failing callback must not stop the rest of the batch
+            if not self._submit() and self.pending == 0 and self.done:
+                self.done()
+
+
+class Reencryption:
+    """
+    Re-encrypt the passwords under a folder to the recipients in the nearest
+    .gpg-id of each, like 'pass init' does after the recipients change, but
+    in a worker pool, see Batch.
+
+    A password is encrypted to a temporary file which then replaces the old
+    one, so an interruption never leaves a password half written. The
+    finished passwords are recorded in a journal, and another run on the same
+    folder with the same recipients skips them.
+    """
+    def __init__(self, root, isdir=True):
+        if os.getenv('PASSWORD_STORE_SIGNING_KEY'):
+            # pass verifies the signature of .gpg-id in that case, which is not done here
+            raise ValueError("PASSWORD_STORE_SIGNING_KEY is set, use pass init instead")
+        self.root = root
+        self.gpg = Pass.backend if isinstance(Pass.backend, GpgBackend) else GpgBackend()
+        self.lock = threading.Lock()
+        self._ids = {}  # folder -> (.gpg-id path, recipients)
+        # symbolic links are skipped, like pass does
+        self.paths = [p for p in (Pass.walk(root) if isdir else [root])
+                      if not os.path.islink(os.path.join(Pass.PASS_DIR, p + '.gpg'))]
+        self.gpg_ids = sorted({self.gpg_id(os.path.dirname(p)) for p in self.paths},
+                              key=str)
+        if any(not recipients for _, recipients in self.gpg_ids):
+            raise ValueError("no .gpg-id found for {}".format(root or 'the store'))
+
+        DEFAULT_CACHE_DIR = os.path.join(os.getenv("HOME"), ".cache")
+        CACHE_DIR = os.getenv("XDG_CACHE_HOME", DEFAULT_CACHE_DIR)
+        digest = hashlib.sha1(os.path.abspath(Pass.PASS_DIR).encode()).hexdigest()[:16]
+        self.journal = os.path.join(CACHE_DIR, "cpass", "reencrypt-{}.txt".format(digest))
+        # identifies the run, a journal of another run is not resumed
+        self.header = json.dumps([Pass.PASS_DIR, root, self.gpg_ids])
+        self.done = self.load()
+        self.pending = [p for p in self.paths if p not in self.done]
+
+    def gpg_id(self, folder):
+        """ the same as Pass.gpg_id, read once for each folder """
+        if folder not in self._ids:
+            self._ids[folder] = Pass.gpg_id(folder)
+        return self._ids[folder]
+
+    @property
+    def recipients(self):
+        return sorted({r for _, recipients in self.gpg_ids for r in recipients})
+
+    def load(self):
+        try:
+            with open(self.journal) as f:
+                if f.readline().rstrip('\n') != self.header:
+                    return set()
+                return {line.rstrip('\n') for line in f}
+        except OSError:
+            return set()
+
+    def begin(self):
+        """ start a new journal, unless resuming the one of the same run """
+        if self.done:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.journal), mode=0o700, exist_ok=True)
+            with open(self.journal, 'w') as f:
+                f.write(self.header + '\n')
+        except OSError as e:
+            logging.warning("Can not write the journal {}: {}".format(self.journal, e))
+
+    def reencrypt(self, path):
+        """ decrypt and encrypt one password, safe to call from worker threads """
+        passfile = os.path.join(Pass.PASS_DIR, path + '.gpg')
+        _, recipients = self.gpg_id(os.path.dirname(path))
+        res = run([self.gpg.gpg, '-d', *self.gpg.opts, passfile],
+                  stdout=PIPE, stderr=PIPE, env=self.gpg.env)
+        if res.returncode != 0:
+            return CompletedProcess(res.args, res.returncode, '',
+                                    res.stderr.decode(errors='replace'))
+
+        enc = self.gpg.encrypt(passfile, res.stdout, recipients)
+        if enc.returncode != 0:
+            return enc
+
+        with self.lock:
+            self.done.add(path)
+            try:
+                with open(self.journal, 'a') as f:
+                    f.write(path + '\n')
+            except OSError as e:
+                logging.warning("Can not write the journal {}: {}".format(self.journal, e))
+        return enc
+
+    def finish(self):
+        """
+        commit all the re-encrypted passwords and the .gpg-id files at once, and
+        drop the journal if all are done. Return the result of Pass.git_commit.
+        """
+        files = [p + '.gpg' for p in self.paths if p in self.done]
+        files += [path for path, _ in self.gpg_ids if path is not None]
+        res = Pass.git_commit(files, "Reencrypt {} using new GPG id {}.".format(
+            '/' + self.root if self.root else 'password store', ', '.join(self.recipients)))
+        if all(p in self.done for p in self.paths) and (res is None or res.returncode == 0):
+            try:
+                os.remove(self.journal)
+            except OSError:
+                pass
+        return res
+
+
+class Clipboard:
+    """
+    Copy text with xclip, xsel or wl-copy in a worker thread, so that the main
+    loop never waits for them.
+
+    Copies requested while the worker is busy are coalesced, only the latest
+    one is copied. Like `pass -c`, the content before the first copy is saved,
+    and restore() puts it back, unless something else was copied meanwhile.
+    callback(ok) is called in the main loop after a copy or restore.
+    """
+    BACKENDS = ['wl-copy', 'xclip', 'xsel']
+
+    def __init__(self, backend='auto', selection='clipboard'):
+        if backend == 'auto':
+            backends = self.BACKENDS if os.getenv('WAYLAND_DISPLAY') else self.BACKENDS[1:]
+            backend = next((b for b in backends if shutil.which(b)), 'xclip')
+        self.backend = backend
+        self.selection = selection
+        self._jobs = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._copied = None  # the text copied by cpass
+        self._before = None  # the text before it
+
+    def command(self, action):
+        sel = self.selection
+        if self.backend == 'wl-copy':
+            primary = ['--primary'] if sel == 'primary' else []
+            return {'copy': ['wl-copy'], 'paste': ['wl-paste', '--no-newline'],
+                    'clear': ['wl-copy', '--clear']}[action] + primary
+        if self.backend == 'xsel':
+            return ['xsel', '--' + sel,
+                    {'copy': '--input', 'paste': '--output', 'clear': '--clear'}[action]]
+        # copying nothing clears it
+        return ['xclip', '-selection', sel] + (['-o'] if action == 'paste' else [])
+
+    def copy(self, text, callback=None):
+        self._request('copy', text, callback)
+
+    def restore(self, callback=None):
+        self._request('restore', None, callback)
+
+    def close(self, delay=0):
+        """
+        wait for the worker to finish and restore the clipboard if needed, after
+        delay seconds in a detached process, which outlives cpass like the one
+        of `pass -c` does
+        """
+        if self._thread is None:
+            return
+        if delay <= 0:
+            self.restore()
+        self._request(None, None, None)
+        self._thread.join(timeout=5)
+        if delay > 0 and self._copied is not None:
+            self._restore_later(delay)
+
+    def _restore_later(self, delay):
+        # the texts go through stdin, the command line is visible to other users
+        state = json.dumps({'backend': self.backend, 'selection': self.selection,
+                            'delay': delay, 'copied': self._copied, 'before': self._before})
+        code = ("import sys; sys.path.insert(0, {!r}); "
+                "import cpass; cpass.Clipboard.detached()").format(
+                    os.path.dirname(os.path.abspath(__file__)))
+        try:
+            proc = Popen([sys.executable, '-c', code],
+                         stdin=PIPE, stdout=DEVNULL, stderr=DEVNULL, text=True,
+                         start_new_session=True)
+            proc.stdin.write(state)
+            proc.stdin.close()
+        except OSError as e:
+            logging.warning("Can not restore the clipboard later: %s", e)
+            self._restore()
+
+    @classmethod
+    def detached(cls):
+        """ the process started by close(), restore after the delay read from stdin """
+        state = json.load(sys.stdin)
+        clipboard = cls(state['backend'], state['selection'])
+        clipboard._copied, clipboard._before = state['copied'], state['before']
+        time.sleep(state['delay'])
+        clipboard._restore()
+
+    def _request(self, action, text, callback):
+        with self._cond:
+            if action == 'copy' and self._jobs and self._jobs[-1][0] == 'copy':
+                # not copied yet, replace it with the latest one
+                self._jobs[-1] = (action, text, callback)
+            else:
+                self._jobs.append((action, text, callback))
+            self._cond.notify()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name='clipboard',
+                                            daemon=True)
+            self._thread.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    self._cond.wait()
+                action, text, callback = self._jobs.pop(0)
+            if action is None:
+                return
+            try:
+                ok = self._copy(text) if action == 'copy' else self._restore()
+            except (OSError, SubprocessError) as e:
+                logging.warning("Can not run %s: %s", self.backend, e)
+                ok = False
+            if callback:
+                dispatcher.call_soon(callback, ok)
+
+    def _run(self, action, text=''):
+        # the output of the copy commands has to be dropped, since they keep
+        # running in background to own the selection
+        return run(self.command(action), input=text, text=True, stderr=DEVNULL,
+                   stdout=PIPE if action == 'paste' else DEVNULL, timeout=5)
+
+    def _copy(self, text):
+        if self._copied is None:
+            res = self._run('paste')
+            self._before = res.stdout if res.returncode == 0 else None
+        ok = self._run('copy', text).returncode == 0
+        if ok:
+            self._copied = text
+        return ok
+
+    def _restore(self):
+        if self._copied is None:
+            return True
+        res = self._run('paste')
+        ok = True
+        # leave it alone if something else was copied after cpass
+        if res.returncode == 0 and res.stdout.rstrip('\n') == self._copied.rstrip('\n'):
+            if self._before:
+                ok = self._run('copy', self._before).returncode == 0
+            else:
+                ok = self._run('clear').returncode == 0
+        self._copied = self._before = None
+        return ok
+
+
+class StartupProfile(list):
+    """
+    Time of the start up phases, printed with --startup-profile. The first
+    phase starts when the process is launched, if /proc tells when it was.
+    """
     def __init__(self):
         super().__init__()
+        self.start = time.perf_counter()
+
+    def mark(self, phase):
+        self.append((phase, time.perf_counter()))
 
+    def launched(self):
+        try:
+            with open('/proc/self/stat') as f:
+                ticks = int(f.read().rpartition(')')[2].split()[19])
+            uptime = time.clock_gettime(time.CLOCK_BOOTTIME)
+        except (OSError, ValueError, IndexError, AttributeError):
+            return None
+        return time.perf_counter() - uptime + ticks / os.sysconf('SC_CLK_TCK')
+
+    def report(self):
+        launched = self.launched()
+        start = self.start if launched is None else min(launched, self.start)
+        lines = [] if launched is None else ["{:8.1f} ms  {}".format(
+            (self.start - start) * 1000, "python started, cpass imported")]
+        last = self.start
+        for phase, t in self:
+            lines.append("{:8.1f} ms  {} (+{:.1f} ms)".format(
+                (t - start) * 1000, phase, (t - last) * 1000))
+            last = t
+        return '\n'.join(lines)
+
+
+class Histogram:
+    """
+    Latencies in logarithmic buckets, STEPS buckets for each doubling from
+    1 µs, so that the percentiles are at most 9% too large.
+    """
+    STEPS = 8
+    BUCKETS = STEPS * 28  # up to about 4 minutes
+
+    def __init__(self):
+        self.buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, seconds):
+        us = seconds * 1e6
+        i = 0 if us <= 1 else min(int(math.log2(us) * self.STEPS) + 1, self.BUCKETS - 1)
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """ the upper bound of the bucket holding the p-th percentile, in seconds """
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(2 ** (i / self.STEPS) / 1e6, self.max)
+        return self.max
+
+
+class Metrics:
+    """
+    Latency histograms of the hot paths, enabled with --metrics.
+
+    The timed functions are only wrapped by instrument() when the metrics are
+    enabled, so they cost nothing otherwise. A function calling itself, like
+    Pass.extract_all, is only timed for the outermost call.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.path = None  # file for dump(), stderr if not set
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def instrument(self, owner, name):
+        """ time owner.name, which can also be a class method or a static method """
+        if not self.enabled:
+            return
+        label = '{}.{}'.format(owner.__name__, name)
+        attr = owner.__dict__[name]
+        wrapper = type(attr) if isinstance(attr, (classmethod, staticmethod)) else None
+        func = attr.__func__ if wrapper else attr
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            running = self._local.__dict__
+            if label in running:
+                return func(*args, **kwargs)
+            running[label] = True
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(label, time.perf_counter() - start)
+                del running[label]
+        setattr(owner, name, wrapper(timed) if wrapper else timed)
+
+    def add(self, label, seconds):
+        with self._lock:
+            if label not in self.histograms:
+                self.histograms[label] = Histogram()
+            self.histograms[label].add(seconds)
+
+    def report(self):
+        lines = ["{:<24} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+            'function', 'count', 'p50 ms', 'p95 ms', 'max ms', 'total ms')]
+        with self._lock:
+            for label, h in sorted(self.histograms.items()):
+                lines.append("{:<24} {:>7} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.1f}".format(
+                    label, h.count, h.percentile(50) * 1000, h.percentile(95) * 1000,
+                    h.max * 1000, h.total * 1000))
+        return '\n'.join(lines)
+
+    def dump(self):
+        if self.path is None:
+            print(self.report(), file=sys.stderr)
+            return
+        try:
+            with open(self.path, 'w') as f:
+                print(self.report(), file=f)
+        except OSError as e:
+            logging.warning("Can not write metrics to %s: %s", self.path, e)
+
+
+class MyConfigParser(configparser.RawConfigParser):
+    def load(self):
         DEFAULT_CONFIG_DIR = os.path.join(os.getenv("HOME"), ".config")
         CONFIG_DIR = os.getenv("XDG_CONFIG_DIR", DEFAULT_CONFIG_DIR)
         CONFIG = os.path.join(CONFIG_DIR, "cpass", "cpass.cfg")
@@ -621,9 +1899,27 @@ class MyConfigParser(configparser.RawConfigParser):
             self.read(CONFIG)
 
         self.preview_layout = self.get('ui', 'preview_layout', 'side')
+        self.preview_delay = float(self.get('ui', 'preview_delay', '0.1'))
         self.icon_dir = self.get('icon', 'dir', '/')
         self.icon_file = self.get('icon', 'file', ' ')
+        self.lazy_scan = self.get('ui', 'lazy_scan', 'false', boolean=True)
+        self.count = self.get('ui', 'count', 'direct')
+        columns = re.split(',\\s*', self.get('ui', 'git_column', 'none'))
+        self.git_column = [c for c in columns if c in ['date', 'age', 'author']]
+        self.watch = self.get('ui', 'watch', 'true', boolean=True)
         self.no_symbols = self.get('pass', 'no_symbols', 'false', boolean=True)
+        self.backend = self.get('pass', 'backend', 'gpg')
+        self.workers = int(self.get('pass', 'workers', '4'))
+        self.clipboard = self.get('pass', 'clipboard', 'auto')
+        self.cache_enabled = self.get('cache', 'enabled', 'false', boolean=True)
+        self.cache_size = int(self.get('cache', 'size', '32'))
+        self.cache_ttl = float(self.get('cache', 'ttl', '60'))
+        self.prefetch = int(self.get('cache', 'prefetch', '0'))
+        self.prefetch_workers = int(self.get('cache', 'prefetch_workers', '1'))
+        self.prefetch_ttl = float(self.get('cache', 'prefetch_ttl', '10'))
+        self.otp_ttl = float(self.get('cache', 'otp_ttl', '300'))
+        self.min_score = int(self.get('audit', 'min_score', '3'))
+        self.max_age = float(self.get('audit', 'max_age', '365'))
 
         self.keybindings = self.get_keybindings()
         self.palette = self.get_palette()
@@ -634,7 +1930,7 @@ class MyConfigParser(configparser.RawConfigParser):
             result = super().get(section, option)
             return result == 'true' if boolean else result.strip("\"\'")
         except (configparser.NoOptionError, configparser.NoSectionError):
-            return fallback
+            return fallback == 'true' if boolean else fallback
 
     def get_keybindings(self):
         action_keys = {
@@ -654,12 +1950,23 @@ class MyConfigParser(configparser.RawConfigParser):
             'search_back': ['?'],
             'search_next': ['n'],
             'search_prev': ['N'],
+            'find': ['f'],
+            'search_content': ['F'],
+            'audit': ['H'],
+            'mark': ['v'],
+            'mark_search': ['*'],
+            'unmark_all': ['u'],
             'insert': ['i'],
             'generate': ['a'],
             'edit': ['e'],
             'delete': ['d'],
+            'rename': ['r'],
+            'move': ['m'],
+            'copy_to': ['c'],
+            'reencrypt': ['R'],
             'copy': ['y'],
             'toggle_preview': ['z'],
+            'stats': ['S'],
             'quit': ['q']
         }
 
@@ -687,6 +1994,7 @@ class MyConfigParser(configparser.RawConfigParser):
             'bright':   ('white',       'default'),
             'focus':    ('standout',    'default'),
             'focusdir': ('black',       'light blue',   'bold'),
+            'mark':     ('yellow',      'default'),
         }
 
         # update from configuration file
@@ -698,7 +2006,7 @@ class MyConfigParser(configparser.RawConfigParser):
 
     def get_copybindings(self):
         """ get field-key pairs """
-        copy_bindings = {'login': 'l'}
+        copy_bindings = {'login': 'l', 'otp': 'o'}
 
         if self.has_section('copy_fields'):
             for field in self.options('copy_fields'):
@@ -707,21 +2015,166 @@ class MyConfigParser(configparser.RawConfigParser):
         return copy_bindings
 
 
-def main():
-    Pass.extract_all()
-    passui = UI()
-
-    mainloop = urwid.MainLoop(passui, palette=config.palette)
-    # set no timeout after escape key
-    mainloop.screen.set_input_timeouts(complete_wait=0)
-    urwid.register_signal(UI, 'redraw')
-    urwid.connect_signal(passui, 'redraw', mainloop.screen.clear)
-    mainloop.run()
-
+def cmd_ls(args):
+    path = args.path.strip('/')
+    if not os.path.isdir(os.path.join(Pass.PASS_DIR, path)):
+        print("Error: {} is not a folder in the password store.".format(path),
+              file=sys.stderr)
+        return 1
+    if args.recursive:
+        for p in Pass.walk(path):
+            print(p)
+        return 0
+    # in the same order as the interface
+    dirs, files = Pass.listdir(path)
+    for d in sorted(dirs, key=str.lower):
+        print(d + '/')
+    for f in sorted(files, key=str.lower):
+        print(f)
+    return 0
+
+
+def cmd_find(args):
+    matches = FindIndex.scan(Pass.walk_folders(), ' '.join(args.pattern), limit=args.limit)
+    for p in matches:
+        print(p)
+    return 0 if matches else 1
+
+
+def cmd_show(args):
+    res = Pass.show(args.path.strip('/'))
+    if res.returncode != 0:
+        print(res.stderr, end='', file=sys.stderr)
+        return res.returncode
+    if args.field is None:
+        print(res.stdout, end='')
+    elif args.field == 'password':
+        print(res.stdout.split('\n')[0])
+    elif args.field == 'otp':
+        try:
+            otp = Otp.parse(res.stdout)
+        except ValueError as e:
+            print("Error: invalid otpauth URI in {}: {}".format(args.path, e),
+                  file=sys.stderr)
+            return 1
+        if otp is None:
+            print("Error: no otpauth URI in {}.".format(args.path), file=sys.stderr)
+            return 1
+        print(otp.now()[0])
+    else:
+        fields = Pass.parse_fields(res.stdout)
+        if args.field not in fields:
+            print("Error: no field '{}' in {}.".format(args.field, args.path),
+                  file=sys.stderr)
+            return 1
+        print(fields[args.field])
+    return 0
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='cpass', description="A console user interface for pass. "
+        "Without a command, the interactive interface is started.")
+    parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + version)
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="print the time of each start up phase on exit")
+    parser.add_argument('--metrics', action='store_true',
+                        help="measure the latency of the slow operations, print it on exit")
+    parser.add_argument('--metrics-file', metavar='FILE',
+                        help="write the metrics to the file instead, implies --metrics")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    cmd = commands.add_parser('ls', help="list a folder of the store")
+    cmd.add_argument('path', nargs='?', default='')
+    cmd.add_argument('-r', '--recursive', action='store_true',
+                     help="list all the passwords under the folder")
+    cmd.set_defaults(func=cmd_ls)
+
+    cmd = commands.add_parser(
+        'find', help="find passwords by name, like the finder in the interface")
+    cmd.add_argument('pattern', nargs='+')
+    cmd.add_argument('-n', '--limit', type=int, default=100,
+                     help="at most this many results")
+    cmd.set_defaults(func=cmd_find)
+
+    cmd = commands.add_parser('show', help="print a password or one of its fields")
+    cmd.add_argument('path')
+    cmd.add_argument('-f', '--field', help="print only this field, 'password' for "
+                     "the first line, 'otp' for the current one time password")
+    cmd.set_defaults(func=cmd_show, index=False)
+
+    return parser.parse_args(argv)
+
+
+def setup(index=True):
+    """
+    load the configuration and the store index, importing cpass does neither,
+    the index is only needed to list the store
+    """
+    logging.basicConfig(level=(logging.DEBUG if os.getenv('DEBUG') else logging.WARNING),
+                        filename=os.path.join(tempfile.gettempdir(), 'cpass.log'))
+    config.load()
+    try:
+        Pass.CLIP_TIME = int(os.getenv("PASSWORD_STORE_CLIP_TIME", "45"))
+    except ValueError:
+        logging.warning("Invalid $PASSWORD_STORE_CLIP_TIME, 45 seconds are used")
+    # exit if pass dir does not exit
+    if not os.path.exists(Pass.PASS_DIR):
+        print("'{}' or $PASSWORD_STORE_DIR does not exist".format(Pass.FALLBACK_PASS_DIR))
+        print("See `man pass` for how to set password storage directory.")
+        sys.exit(1)
+    if index:
+        Pass.index.load()
+    if config.git_column and os.path.exists(os.path.join(Pass.PASS_DIR, '.git')):
+        # the history is read in background, see cpass_tui.run
+        Pass.gitlog = GitLog(Pass.PASS_DIR)
+    if config.backend in Pass.backends:
+        Pass.backend = Pass.backends[config.backend]()
+    if config.cache_enabled:
+        Pass.cache = PlainCache(max(config.cache_size, 2 * config.prefetch + 1),
+                                config.cache_ttl)
+    elif config.prefetch > 0:
+        # only the prefetched passwords are kept
+        Pass.cache = PlainCache(2 * config.prefetch + 1, config.prefetch_ttl)
+    Pass.otps = PlainCache(16, config.otp_ttl)
+    metrics.instrument(Pass, 'extract_all')
+    metrics.instrument(Pass, 'show')
+    metrics.instrument(Pass, 'search')
+    metrics.instrument(FindIndex, 'find')
 
-logging.basicConfig(level=(logging.DEBUG if os.getenv('DEBUG') else logging.DEBUG),
-                    filename=os.path.join(tempfile.gettempdir(), 'cpass.log'))
 
+def main():
+    args = parse_args()
+    metrics.enabled = args.metrics or args.metrics_file is not None
+    metrics.path = args.metrics_file
+    setup(index=getattr(args, 'index', True))
+    startup.mark("configuration and index loaded")
+    try:
+        if args.command:
+            code = args.func(args)
+            startup.mark("command finished")
+            sys.exit(code)
+        # urwid takes most of the start up time, import it only when needed
+        import cpass_tui
+        startup.mark("urwid imported")
+        cpass_tui.run()
+    finally:
+        dispatcher.shutdown()
+        Pass.index.save()
+        if Pass.gitlog is not None:
+            Pass.gitlog.save()
+        if args.startup_profile:
+            print(startup.report(), file=sys.stderr)
+        if metrics.enabled:
+            metrics.dump()
+
+
+startup = StartupProfile()
+metrics = Metrics()
 config = MyConfigParser()
+dispatcher = Dispatcher()
 if __name__ == '__main__':
+    # share this module with cpass_tui, instead of importing it again
+    sys.modules['cpass'] = sys.modules[__name__]
     main()
@@ -0,0 +1,1463 @@
+#!/usr/bin/env python3
+# Author: Lu Xu <oliver_lew at outlook dot com>
+# License: MIT License Copyright (c) 2021 Lu Xu
+"""
+The urwid interface of cpass. It is only imported when the interface starts,
+the command line queries in cpass do not need urwid.
+"""
+
+import os
+import sys
+import time
+import bisect
+import logging
+from collections import OrderedDict
+from subprocess import CompletedProcess
+
+from cpass import (Pass, Watcher, Batch, Clipboard, Otp, Reencryption, GitLog, config,
+                   dispatcher, startup, metrics)
+
+# urwid imports an event loop for each of the async frameworks installed, which
+# can take longer than all the rest of the start up. cpass only uses the default
+# one, so hide the frameworks not imported yet while urwid is imported.
+_hidden = [m for m in ('trio', 'twisted', 'tornado', 'gi', 'zmq') if m not in sys.modules]
+sys.modules.update(dict.fromkeys(_hidden))
+try:
+    import urwid
+finally:
+    for m in _hidden:
+        if sys.modules.get(m, 0) is None:
+            del sys.modules[m]
+
+
+class PassNode(urwid.AttrMap):
+    EMPTY = "-- EMPTY --"
+    # widths of the git columns, see git_text
+    GIT_WIDTHS = {'date': 10, 'age': 4, 'author': 12}
+
+    def __init__(self, node, root, isdir=False, marked=False):
+        self.empty = node is None
+        self.isdir = isdir
+        self.node = node or self.EMPTY
+        self.path = os.path.join(root, node) if node else ''
+        # identifies the item, even if the widget is created again
+        self.key = (self.path, isdir)
+        self.icon = config.icon_dir if isdir else config.icon_file if node else ''
+
+        self._selectable = True
+        columns = [
+            ('pack', urwid.Text(self.icon)),
+            urwid.Text(self.node, wrap='clip'),
+            ('pack', urwid.Text(''))
+        ]
+        if config.git_column:
+            width = sum(self.GIT_WIDTHS[c] + 1 for c in config.git_column)
+            columns.append(('fixed', width, urwid.Text(self.git_text(), wrap='clip')))
+        super().__init__(urwid.Columns(columns),
+            'mark' if marked else 'dir' if isdir else '' if node else 'bright',
+            'focusdir' if isdir else 'focus' if node else 'bright',
+        )
+
+        self.update_count()
+
+    def update_count(self):
+        # the folder totals are added up from the sub-folders, see
+        # Pass.add_folder, and kept up to date by Pass.add_total
+        if not self.isdir:
+            return
+        recursive = config.count != 'direct'
+        # NOTE: dict.get does not trigger scanning, see PassTree
+        folder = dict.get(Pass.all_pass, self.path)
+        counts = Pass.counts.get(self.path)
+        if folder is not None and (folder.total is not None or not recursive):
+            self.set_count(folder.count, folder.total)
+        elif counts is not None and (counts[1] is not None or not recursive):
+            self.set_count(*counts)
+        else:
+            # folder not scanned yet in lazy mode, count the entries in background
+            dispatcher.submit('count', Pass.count, self.path, recursive,
+                              callback=lambda f: self.set_count(*f.result()))
+
+    def set_count(self, direct, total=None):
+        if config.count == 'recursive':
+            text = str(total)
+        elif config.count == 'both':
+            text = '{} ({})'.format(direct, total)
+        else:
+            text = str(direct)
+        self.original_widget.contents[2][0].set_text(text)
+
+    def git_text(self):
+        """ the last commit of the item, from the git log read in background """
+        commit = Pass.gitlog.get(self.path) if Pass.gitlog and not self.empty else None
+        if commit is None:
+            return ''
+        timestamp, author = commit
+        fields = {
+            'date': time.strftime('%Y-%m-%d', time.localtime(timestamp)),
+            'age': self.age(time.time() - timestamp),
+            'author': author,
+        }
+        widths = self.GIT_WIDTHS
+        return ''.join(' {:<{}.{}}'.format(fields[c], widths[c], widths[c])
+                       for c in config.git_column)
+
+    @staticmethod
+    def age(seconds):
+        """ short and rough, like 5h, 12d, 3mo and 2y """
+        days = seconds / 86400
+        if days < 1:
+            return '{}h'.format(max(0, int(seconds / 3600)))
+        if days < 60:
+            return '{}d'.format(int(days))
+        if days < 730:
+            return '{}mo'.format(int(days / 30.44))
+        return '{}y'.format(int(days / 365.25))
+
+    def keypress(self, size, key):
+        """ let the widget pass through the keys to parent widget """
+        return key
+
+
+class PassList(urwid.ListBox):
+    def __init__(self, body, root='', ui=None):
+        self._ui = ui
+        self.root = root
+        self._size = (1, 1)
+        super().__init__(body)
+
+    def mouse_event(self, size, event, button, col, row, focus):
+        self._size = size
+        focus_offset = self.get_focus_offset_inset(size)[0]
+
+        logging.debug("passlist mouse event: %s %s %s %s %s %s %s %s", size, event,
+                      button, col, row, focus, self.focus_position, focus_offset)
+
+        if button == 1:
+            if size[1] > len(self.body):
+                # NOTE: offset is wrong(?) when size is larger than length
+                # so the processing is different
+                if row == self.focus_position:
+                    self.dir_navigate('down')
+                else:
+                    self.list_navigate(new_focus=row)
+            else:
+                if row == focus_offset:
+                    self.dir_navigate('down')
+                else:
+                    self.list_navigate(new_focus=self.focus_position - focus_offset + row)
+        elif button == 3:
+            self.dir_navigate('up')
+        elif button == 4:
+            self.list_navigate(-1)
+        elif button == 5:
+            self.list_navigate(1)
+        else:
+            return super().mouse_event(size, event, button, col, row, focus)
+
+    def keypress(self, size, key):
+        self._size = size
+        logging.debug("passlist keypress: %s %s", key, size)
+
+        list_navigation_offsets = {
+            'down': 1,
+            'up': -1,
+            # overshoot to go to bottom/top
+            'end': len(self.body),
+            'home': -len(self.body),
+            'down_screen': size[1],
+            'up_screen': -size[1],
+            'down_half_screen': size[1] // 2,
+            'up_half_screen': -size[1] // 2,
+        }
+
+        dir_navigation_directions = {
+            # the confirm key doubles as enter folder key
+            'confirm': 'down',
+            'dir_down': 'down',
+            'dir_up': 'up',
+        }
+
+        action = config.keybindings.get(key)
+        if action in list_navigation_offsets:
+            self.list_navigate(list_navigation_offsets[action])
+        elif action in dir_navigation_directions:
+            self.dir_navigate(dir_navigation_directions[action])
+        else:
+            return super().keypress(size, key)
+
+    def dir_navigate(self, direction):
+        # change root position accordingly
+        if direction in 'down' and self.focus.isdir:
+            self.root = os.path.join(self.root, self.focus.node)
+        elif direction in 'up':
+            self.root = os.path.dirname(self.root)
+
+        # swap the folder shown by the walker, instead of copying its content
+        self.body.set_folder(Pass.all_pass[self.root])
+
+        # restore cursor position of the new root
+        self.focus_position = self.body.focus
+
+        self._ui.update_view()
+
+    def list_navigate(self, shift=0, new_focus=None):
+        """ either specify a shift offset, or an absolute target position """
+        offset = self.get_focus_offset_inset(self._size)[0]
+
+        if new_focus is not None:
+            shift = new_focus - self.focus_position
+        else:
+            new_focus = shift + self.focus_position
+        new_offset = offset + shift
+
+        # border check
+        new_focus = min(max(0, new_focus), len(self.body) - 1)
+        new_offset = min(max(0, new_offset), self._size[1] - 1)
+
+        self.change_focus(self._size, new_focus, offset_inset=new_offset)
+        self._ui.update_view()
+
+    def toggle_mark(self):
+        if not self.focus.empty:
+            self.body.marked ^= {self.focus.key}
+            self.body.refresh()
+            self.list_navigate(1)
+
+    def mark_matches(self, pattern):
+        """ mark all the items in the current folder matching the search pattern """
+        for name, isdir in self.body.folder.entries():
+            if UI.match_name(pattern, name):
+                self.body.marked.add((os.path.join(self.root, name), isdir))
+        self.body.refresh()
+
+    def unmark_all(self):
+        self.body.marked.clear()
+        self.body.refresh()
+
+    def jump(self, path, isdir=False):
+        """ go to the folder containing the path and focus on it, '' is the root """
+        root, name = os.path.split(path)
+        if not path:
+            pos = Pass.all_pass[root].pos
+        else:
+            pos = Pass.all_pass[root].position(name, isdir)
+        if pos is None:
+            return False
+
+        self.root = root
+        self.body.set_folder(Pass.all_pass[root])
+        self.list_navigate(new_focus=pos)
+        return True
+
+    def insert(self, node):
+        def insert_relative(r, n):
+            # if starts with /, then assume the node is relative to store root
+            if n.startswith('/'):
+                n = n.lstrip('/')
+                r = ''
+
+            # separate at the first /
+            n1, sep, n2 = n.partition('/')
+            # recursively insert if there are more levels
+            if sep == '/':
+                insert_relative(os.path.join(r, n1), n2)
+
+            # change stored list, a folder not seen before is scanned from the
+            # disk, and the totals of the parents are updated
+            Pass.all_pass[r].pos = Pass.add_entry(r, n1, sep == '/')
+            if sep != '/':
+                Pass.finder.add(os.path.join(r, n1))
+
+            # do not change cursor position if the path is not relative
+            return Pass.all_pass[r].pos if r == self.root else None
+
+        inserted_pos = insert_relative(self.root, node.strip())
+        # the counts of the sub-folders may change as well
+        self.body.refresh()
+        # focus the new node
+        self.list_navigate(new_focus=inserted_pos)
+
+        self._ui.update_view()
+
+    def delete(self, pos):
+        # change stored list
+        name, _ = Pass.remove_entry(self.root, pos)
+        Pass.finder.remove(os.path.join(self.root, name))
+        self.body.refresh()
+
+        self._ui.update_view()
+
+
+class FolderWalker(urwid.ListWalker):
+    """
+    List walker showing the content of a Folder. The PassNode widgets are only
+    created for the rows being displayed, and the recently used ones are cached.
+
+    An empty folder shows a placeholder item, which troubles listbox operations
+    otherwise.
+    """
+    CACHE_SIZE = 128
+
+    def __init__(self, folder):
+        self.folder = folder
+        # marked (path, isdir) pairs, across all folders
+        self.marked = set()
+        self._widgets = OrderedDict()
+
+    def set_folder(self, folder):
+        self.folder = folder
+        self.refresh()
+
+    def refresh(self):
+        """ drop the widgets after the folder is modified """
+        self._widgets.clear()
+        self.folder.pos = min(self.folder.pos, len(self) - 1)
+        self._modified()
+
+    @property
+    def focus(self):
+        return self.folder.pos
+
+    def __len__(self):
+        return max(1, self.folder.count)
+
+    def __getitem__(self, pos):
+        if not 0 <= pos < len(self):
+            raise IndexError(pos)
+
+        key = self.folder.entry(pos)
+        widget = self._widgets.get(key)
+        if widget is None:
+            name, isdir = key
+            path = os.path.join(self.folder.path, name) if name else None
+            widget = PassNode(name, self.folder.path, isdir, (path, isdir) in self.marked
+                              ) if name else PassNode(None, None)
+            self._widgets[key] = widget
+            if len(self._widgets) > self.CACHE_SIZE:
+                self._widgets.popitem(last=False)
+        else:
+            self._widgets.move_to_end(key)
+        return widget
+
+    def set_focus(self, pos):
+        if not 0 <= pos < len(self):
+            raise IndexError(pos)
+        self.folder.pos = pos
+        self._modified()
+
+    def next_position(self, pos):
+        if pos >= len(self) - 1:
+            raise IndexError(pos)
+        return pos + 1
+
+    def prev_position(self, pos):
+        if pos <= 0:
+            raise IndexError(pos)
+        return pos - 1
+
+    def positions(self, reverse=False):
+        return range(len(self) - 1, -1, -1) if reverse else range(len(self))
+
+
+class ResultNode(urwid.AttrMap):
+    def __init__(self, path, text=None, isdir=False):
+        self.path = path
+        self.isdir = isdir
+        self._selectable = True
+        super().__init__(urwid.Text(text or path, wrap='clip'), '', 'focus')
+
+    def keypress(self, size, key):
+        """ let the widget pass through the keys to parent widget """
+        return key
+
+
+class ResultList(urwid.ListBox):
+    """ list of password paths, shown in place of the preview """
+    def __init__(self):
+        super().__init__(urwid.SimpleFocusListWalker([]))
+        # sort keys of the inserted results, in the order of the list
+        self._keys = []
+        self._sort_keys = {}  # (path, isdir) -> key
+
+    def set_results(self, paths):
+        self.body[:] = [ResultNode(p) for p in paths]
+        self._keys = []
+        self._sort_keys = {}
+        if self.body:
+            self.body.set_focus(0)
+
+    def append(self, path, text=None):
+        self.body.append(ResultNode(path, text))
+
+    def insert(self, key, path, text, isdir=False):
+        """ insert in the order of the keys, or move the existing result of the path """
+        self.remove(path, isdir)
+        pos = bisect.bisect(self._keys, key)
+        self._keys.insert(pos, key)
+        self._sort_keys[(path, isdir)] = key
+        self.body.insert(pos, ResultNode(path, text, isdir))
+
+    def remove(self, path, isdir=False):
+        key = self._sort_keys.pop((path, isdir), None)
+        if key is not None:
+            pos = bisect.bisect_left(self._keys, key)
+            del self._keys[pos]
+            del self.body[pos]
+
+    def __contains__(self, item):
+        """ whether (path, isdir) is inserted """
+        return item in self._sort_keys
+
+    def move(self, shift):
+        if self.body:
+            self.body.set_focus(min(max(0, self.body.focus + shift), len(self.body) - 1))
+
+    @property
+    def selected(self):
+        return self.focus.path if self.body else None
+
+
+# TODO: auto change split direction based on terminal size
+# TODO: multiline insert, this should be easy since we have the workaround in Pass.edit
+# TODO: QR code generate, maybe?
+class UI(urwid.Frame):
+    # modes showing results, where the cursor keys move in the results list
+    RESULT_MODES = ["content", "audit"]
+    # the orders of the audit results, switched with the audit key
+    AUDIT_ORDERS = ["folder", "strength", "reuse", "age"]
+
+    def __init__(self):
+        self._app_string = 'cPass'
+        self._help_string = (' a:generate d:delete e:edit i:insert y:copy z:toggle'
+                             ' /:search f:find')
+        self._edit_type = None
+        self._last_preview = None
+        self._preview_future = None
+        self._preview_result = None
+        self._preview_alarm = None
+        self._prefetching = {}  # path -> future
+        # one time password of the previewed password, refreshed by the alarm
+        self._otp = None
+        self._otp_alarm = None
+        self._clip_alarm = None
+        self._clip_deadline = 0
+        self.clipboard = Clipboard(config.clipboard, Pass.X_SELECTION)
+        self._preview_shown = True
+        self._view_outdated = False
+        # set when the main loop is created, needed for the timers
+        self.mainloop = None
+        self._search_pattern = None
+        self._search_direction = 1
+        self._batch = None
+        # apart from _batch, these go on under the finder and the searches
+        self._bulk_batch = None
+        self._reencryption = None
+        self._reencrypt_batch = None
+        self._audit_order = 0
+        self._findings = {}  # path -> (digest, score) of the audit
+        self._reused = {}  # digest -> paths
+
+        # header
+        self.header_prefix = urwid.Text(('border', '{}:'.format(self._app_string)))
+        self.path_indicator = urwid.Text(('bright', ''), wrap='clip')
+        self.help_text = urwid.Text(self._help_string, wrap='clip', align='right')
+        # priority on showing full path
+        self.header_widget = urwid.Columns([
+            ('pack', self.header_prefix),
+            ('pack', self.path_indicator),
+            self.help_text
+        ], dividechars=1)
+
+        # footer
+        self.messagebox = urwid.Text('')
+        self.count_indicator = urwid.Text('', align='right')
+        self.footer_widget = urwid.Columns([
+            self.messagebox,
+            ('pack', urwid.AttrMap(self.count_indicator, 'border'))
+        ])
+
+        # some dynamic widgets
+        self.divider = urwid.AttrMap(urwid.Divider('-'), 'border')
+        self.preview = urwid.Filler(urwid.Text(''), valign='top')
+        self.editbox = urwid.Edit()
+        self.results = ResultList()
+        urwid.connect_signal(self.editbox, 'postchange', lambda *args: self.update_find())
+
+        self.listbox = PassList(FolderWalker(Pass.all_pass['']), ui=self)
+
+        # use Columns for horizonal layout, and Pile for vertical
+        if config.preview_layout in ['side', 'horizontal']:
+            self.middle = urwid.Columns([], dividechars=1)
+        elif config.preview_layout in ['bottom', 'vertical']:
+            self.middle = urwid.Pile([])
+        self.update_preview_layout()
+        self.update_view()
+
+        super().__init__(self.middle, self.header_widget, self.footer_widget)
+
+    def message(self, message, alert=False):
+        self.messagebox.set_text(('alert' if alert else 'normal',
+                                  message.replace('\n', ' ')))
+
+    def update_preview_layout(self, side=None):
+        """ show the preview, or another widget in its place """
+        if side is None and self._preview_shown:
+            side = self.preview
+        if side is not None:
+            if config.preview_layout in ['side', 'horizontal']:
+                self.middle.contents = [(self.listbox, ('weight', 1, False)),
+                                        (side, ('weight', 1, False))]
+            if config.preview_layout in ['bottom', 'vertical']:
+                self.middle.contents = [(self.listbox, ('weight', 1)),
+                                        (self.divider, ('pack', 1)),
+                                        (side, ('weight', 1))]
+            if side is self.preview:
+                self.update_preview(True)
+        else:
+            self.middle.contents = [(self.listbox, ('weight', 1, False))]
+        self.middle.focus_position = 0
+
+    def mouse_event(self, size, event, button, col, row, focus):
+        logging.debug("ui mouse event: %s %s %s %s %s %s",
+                      size, event, button, col, row, focus)
+        # Prevent focus change due to clicking when editing
+        r = self.contents['footer'][0].rows(size[:1], True)
+        if self._edit_type is None or self._edit_type and row >= size[1] - r:
+            super().mouse_event(size, event, button, col, row, focus)
+
+    def keypress(self, size, key):
+        logging.debug("ui keypress: %s %s", key, size)
+        action = config.keybindings.get(key)
+        if self.body is not self.middle:
+            # any key closes the stats overlay
+            self.body = self.middle
+        elif action == 'cancel':
+            stop = self._edit_type is None and self._reencrypt_batch is not None
+            self.unfocus_edit()
+            if stop:
+                self.stop_reencryption()
+        elif self._edit_type == "find" and action in ['down', 'up'] and len(key) > 1:
+            # only the special keys, the others are typed into the editbox
+            self.results.move(1 if action == 'down' else -1)
+        elif self._edit_type in self.RESULT_MODES:
+            if action in ['down', 'up']:
+                self.results.move(1 if action == 'down' else -1)
+            elif action == 'confirm':
+                self.handle_input()
+            elif action == 'audit' and self._edit_type == "audit":
+                self.sort_audit()
+        elif self._edit_type == "copy":
+            self.unfocus_edit()
+            self.copy_by_key(key)
+        elif self._edit_type == "delete":
+            self.unfocus_edit()
+            self.delete_confirm(key)
+        elif self._edit_type == "reencrypt":
+            self.unfocus_edit()
+            self.reencrypt_confirm(key)
+        elif self._edit_type in ["bulk_delete", "bulk_generate"]:
+            edit_type = self._edit_type
+            self.unfocus_edit()
+            self.bulk_confirm(edit_type, key)
+        elif self._edit_type is not None:
+            if action == 'confirm':
+                self.handle_input()
+            else:
+                # pass through to edit widget (the focused widget)
+                return super().keypress(size, key)
+        elif action == 'quit':
+            raise urwid.ExitMainLoop
+        elif action == 'search' or action == 'search_back':
+            self.focus_edit("search", '/' if action == 'search' else '?')
+            self._search_direction = 1 if action == 'search' else -1
+        elif action == 'search_next' or action == 'search_prev':
+            self.search_in_dir(self._search_pattern,
+                               1 if action == 'search_next' else -1)
+        elif action == 'find':
+            self.focus_edit("find", 'Find: ')
+            self.update_preview_layout(self.results)
+            self.update_find()
+        elif action == 'search_content':
+            self.focus_edit("search_content", 'Search content (e.g. login:foo): ')
+        elif action == 'audit':
+            self.audit()
+        elif action == 'insert':
+            self.focus_edit("insert", 'Enter password filename: ')
+        elif action == 'generate' and self.listbox.body.marked:
+            self.focus_edit("bulk_generate", 'Generate new passwords for {} marked items? '
+                            '[Y/n]'.format(len(self.marked_files())))
+        elif action == 'generate':
+            self.focus_edit("generate", 'Generate a password file: ')
+        elif action == 'edit' and not self.listbox.focus.isdir:
+            self.run_pass(Pass.edit, None,
+                          self.listbox.focus.node, self.listbox.root, "Edit: {}")
+            urwid.emit_signal(self, 'redraw')
+        elif action == 'delete' and self.listbox.body.marked:
+            self.focus_edit("bulk_delete", 'Are you sure to delete {} marked items? '
+                            '[Y/n]'.format(len(self.listbox.body.marked)))
+        elif action == 'delete' and not self.listbox.focus.empty:
+            self.focus_edit("delete", 'Are you sure to delete {} {}? [Y/n]'.format(
+                "the whole folder" if self.listbox.focus.isdir else "the file",
+                os.path.join('/', self.listbox.root, self.listbox.focus.node)
+            ))
+        elif action == 'reencrypt' and not self.listbox.focus.empty:
+            self.reencrypt_prompt()
+        elif action in ['rename', 'move', 'copy_to'] and not self.listbox.focus.empty:
+            self.move_prompt(action)
+        elif action == 'copy':
+            self.copy_confirm()
+        elif action == 'mark':
+            self.listbox.toggle_mark()
+        elif action == 'mark_search':
+            if self._search_pattern is None:
+                self.message("No search pattern", alert=True)
+            else:
+                self.listbox.mark_matches(self._search_pattern)
+        elif action == 'unmark_all':
+            self.listbox.unmark_all()
+        elif action == 'toggle_preview':
+            self._preview_shown = not self._preview_shown
+            self.update_preview_layout()
+        elif action == 'stats':
+            self.show_stats()
+        else:
+            return super().keypress(size, key)
+
+    def show_stats(self):
+        """
+        show the latency metrics over the interface, and write them to the file
+        if given
+        """
+        if not metrics.enabled:
+            self.message("Metrics are disabled, start cpass with --metrics", alert=True)
+            return
+        metrics.dump()
+        report = urwid.Text(('normal', metrics.report()))
+        stats = urwid.LineBox(urwid.Filler(report, valign='top'),
+                              title="Latency", tlcorner='+', trcorner='+', blcorner='+',
+                              brcorner='+', lline='|', rline='|', tline='-', bline='-')
+        self.body = urwid.Overlay(urwid.AttrMap(stats, 'border'), self.middle,
+                                  'center', ('relative', 90), 'middle', ('relative', 80))
+
+    def unfocus_edit(self):
+        if self._edit_type == "find" or self._edit_type in self.RESULT_MODES:
+            self._edit_type = None
+            self.update_preview_layout()
+            if self._batch is not None:
+                self._batch.cancel()
+                self._batch = None
+        self._edit_type = None
+        self.contents['footer'] = (self.footer_widget, None)
+        self.set_focus('body')
+        self.messagebox.set_text('')
+        self.editbox.set_mask(None)
+
+    def focus_results(self, edit_type):
+        """ show the results list, while keeping the message box in the footer """
+        self._edit_type = edit_type
+        self.results.set_results([])
+        self.update_preview_layout(self.results)
+
+    def focus_edit(self, edit_type, cap, mask=None):
+        self._edit_type = edit_type
+        self.contents['footer'] = (self.editbox, None)
+        self.set_focus('footer')
+        self.editbox.set_caption(cap)
+        self.editbox.set_mask(mask)
+        self.editbox.set_edit_text('')
+
+    def handle_input(self):
+        # these codes are ugly
+        edit_type = self._edit_type
+        self.unfocus_edit()
+        if edit_type == "search":
+            self._search_pattern = self.editbox.edit_text
+            self.search_in_dir(self._search_pattern, 1)
+        elif edit_type == "find" or edit_type in self.RESULT_MODES:
+            if self.results.selected is not None and not self.listbox.jump(
+                    self.results.selected, self.results.focus.isdir):
+                self.message("No longer exists: {}".format(self.results.selected),
+                             alert=True)
+        elif edit_type == "search_content":
+            self.search_content(self.editbox.edit_text)
+        elif edit_type == "generate":
+            self.run_pass(Pass.generate, self.listbox.insert,
+                          self.editbox.edit_text, self.listbox.root, "Generate: {}")
+        elif edit_type == "insert":
+            self._insert_node = self.editbox.edit_text
+            self.focus_edit("insert_password", 'Enter password: ', mask='*')
+        elif edit_type == "insert_password":
+            self._insert_pass = self.editbox.edit_text
+            self.focus_edit("insert_password_confirm", 'Enter password again: ', mask='*')
+        elif edit_type == "insert_password_confirm":
+            self._insert_pass_again = self.editbox.edit_text
+            if self._insert_pass == self._insert_pass_again:
+                self.run_pass(Pass.insert, self.listbox.insert,
+                              self._insert_node, self.listbox.root, "Insert: {}",
+                              args=(self._insert_pass,))
+            else:
+                self.message("Password is not the same", alert=True)
+        elif edit_type in ["rename", "move", "copy_to"]:
+            self.move_to(edit_type, self.editbox.edit_text.strip())
+
+    def update_view(self):
+        # header and footer are updated only once before the next redraw, no
+        # matter how many times the cursor is moved in between, see render
+        self._view_outdated = True
+        self._invalidate()
+
+        self.schedule_preview()
+
+    def render(self, size, focus=False):
+        if self._view_outdated:
+            self._view_outdated = False
+            # update header
+            self.path_indicator.set_text(('bright', "/" + self.listbox.root))
+
+            # update footer
+            self.count_indicator.set_text("{}/{}".format(
+                self.listbox.focus_position + 1,
+                len(self.listbox.body)
+            ) if not self.listbox.focus.empty else "0/0")
+
+        return super().render(size, focus)
+
+    def schedule_preview(self):
+        """ update the preview after the cursor stays still for a moment """
+        if self._preview_alarm is not None:
+            self.mainloop.remove_alarm(self._preview_alarm)
+            self._preview_alarm = None
+
+        if self.mainloop is None or config.preview_delay <= 0:
+            self.update_preview()
+        elif self._preview_shown and self.listbox.focus.key != self._last_preview:
+            self._preview_alarm = self.mainloop.set_alarm_in(
+                config.preview_delay, lambda loop, data: self.update_preview())
+
+    def update_preview(self, force=False):
+        self._preview_alarm = None
+        if not self._preview_shown:
+            return
+
+        if not force and self.listbox.focus.key == self._last_preview:
+            return
+        self._last_preview = self.listbox.focus.key
+        self._preview_result = None
+        self.stop_otp()
+        # drop the pending decryption of the previous item, if not started yet
+        if self._preview_future is not None:
+            self._preview_future.cancel()
+            self._preview_future = None
+        path = os.path.join(self.listbox.root, self.listbox.focus.node)
+        self.cancel_prefetch(keep=[path])
+
+        if not self.listbox.focus.empty:
+            if self.listbox.focus.isdir:
+                preview = "\n".join([(config.icon_dir if isdir else config.icon_file) + f
+                                     for f, isdir in Pass.all_pass[path].entries()
+                                     ]) or PassNode.EMPTY
+            elif Pass.cache.get(path) is not None:
+                self._preview_result = Pass.show(path)
+                preview = self._preview_result.stdout
+            elif path in self._prefetching:
+                # being prefetched, wait for it instead of decrypting it again
+                key = self.listbox.focus.key
+                self._preview_future = self._prefetching[path]
+                self._preview_future.add_done_callback(lambda f: f.cancelled() or (
+                    dispatcher.call_soon(self.show_preview, key, f)))
+                preview = ('border', "Decrypting...")
+            else:
+                # decrypt in background, the placeholder is replaced when it is done
+                key = self.listbox.focus.key
+                self._preview_future = dispatcher.submit(
+                    'preview', Pass.show, path,
+                    callback=lambda f: self.show_preview(key, f))
+                preview = ('border', "Decrypting...")
+        else:
+            preview = ""
+
+        self.preview.original_widget.set_text(preview)
+        if self._preview_result is not None:
+            self.show_otp()
+        if self._preview_future is None:
+            self.prefetch()
+
+    def show_preview(self, key, future):
+        # ignore the results that come after the focus moved on
+        if key != self._last_preview:
+            return
+        self._preview_future = None
+        if future.exception() is not None:
+            # e.g. gpg or pass is not installed
+            logging.warning("Decrypting {} failed: {}".format(key, future.exception()))
+            res = CompletedProcess(None, 1, '', "Error: {}".format(future.exception()))
+        else:
+            res = future.result()
+        self._preview_result = res
+        self.preview.original_widget.set_text(res.stderr if res.returncode else res.stdout)
+        self.show_otp()
+        self.prefetch()
+
+    def show_otp(self):
+        """ add the one time password to the preview, if there is an otpauth URI """
+        if self._preview_result.returncode != 0:
+            return
+        try:
+            self._otp = Pass.otp(self._last_preview[0], self._preview_result.stdout)
+        except ValueError as e:
+            self.message("Invalid otpauth URI: {}".format(e), alert=True)
+            return
+        if self._otp is not None:
+            self.update_otp()
+
+    def update_otp(self, loop=None, data=None):
+        """ refresh the code and its countdown every second, without decrypting again """
+        self._otp_alarm = None
+        if self._otp is None or not self._preview_shown:
+            return
+        code, remaining = self._otp.now()
+        self.preview.original_widget.set_text([
+            self._preview_result.stdout.rstrip('\n') + '\n\n',
+            ('bright', 'OTP: {}'.format(code)
+             + (' ({}s)'.format(remaining) if remaining else ''))
+        ])
+        if self.mainloop is not None and remaining is not None:
+            # right after the next second begins
+            self._otp_alarm = self.mainloop.set_alarm_in(1.01 - time.time() % 1,
+                                                         self.update_otp)
+
+    def stop_otp(self):
+        if self._otp_alarm is not None:
+            self.mainloop.remove_alarm(self._otp_alarm)
+            self._otp_alarm = None
+        self._otp = None
+
+    def prefetch(self):
+        """
+        decrypt the passwords around the focus into the cache, after the focused
+        one is shown, so that scrolling through them shows them at once
+        """
+        if config.prefetch <= 0:
+            return
+        folder = Pass.all_pass[self.listbox.root]
+        pos = self.listbox.focus_position
+        paths = []
+        for i in range(1, config.prefetch + 1):
+            for p in (pos + i, pos - i):
+                name, isdir = folder.entry(p)
+                if name is not None and not isdir:
+                    paths.append(os.path.join(self.listbox.root, name))
+        self.cancel_prefetch(paths)
+        for path in paths:
+            if path not in self._prefetching and Pass.cache.get(path) is None:
+                self._prefetching[path] = dispatcher.submit(
+                    'prefetch', Pass.show, path, config.prefetch_ttl,
+                    workers=config.prefetch_workers)
+
+    def cancel_prefetch(self, keep=()):
+        """ cancel the prefetching not started yet, except for the paths to keep """
+        for path, future in list(self._prefetching.items()):
+            if future.done() or path not in keep and future.cancel():
+                del self._prefetching[path]
+
+    def run_pass(self, func, lfunc, node, root, msg='', args=(), largs=()):
+        # do not accept password name ends with /, pass itself has problems
+        if node.endswith('/'):
+            self.message(f'Can not create a directory: {node}.', alert=True)
+            return
+
+        path = os.path.join(root, node)
+        res = func(path, *args)
+        # the cached content is outdated after any modification
+        if func != Pass.show:
+            Pass.invalidate(path)
+        if res.returncode == 0:
+            self.message(msg.format(path) if func != Pass.show else '')
+            if lfunc:
+                lfunc(node if lfunc == self.listbox.insert else largs[0])
+            if func != Pass.show:
+                self.update_git()
+            # some operations like generating password need updating the preview
+            self.update_preview(True)
+        else:
+            self.message(res.stderr, alert=True)
+
+        return res
+
+    def delete_confirm(self, key):
+        if key in ['y', 'Y', 'd', 'enter']:
+            self.run_pass(Pass.delete, self.listbox.delete,
+                          self.listbox.focus.node, self.listbox.root,
+                          "Deleting {}", largs=(self.listbox.focus_position,))
+        elif key in ['n', 'N']:
+            self.message("Abort.")
+        else:
+            self.message("Invalid option.", alert=True)
+
+    def move_prompt(self, action):
+        """ ask where the focused item goes, starting from its name or its folder """
+        focus = self.listbox.focus
+        caption = {'rename': 'Rename {} to: ', 'move': 'Move {} to: ',
+                   'copy_to': 'Copy {} to: '}
+        self.focus_edit(action, caption[action].format(
+            os.path.join('/', self.listbox.root, focus.node)))
+        text = (focus.node if action == 'rename'
+                else os.path.join('/', self.listbox.root, ''))
+        self.editbox.set_edit_text(text)
+        self.editbox.set_edit_pos(len(text))
+
+    def move_to(self, action, node):
+        """
+        move or copy the focused item with pass, the scanned folders are updated
+        in place instead of scanning the store again, see Pass.moved
+        """
+        focus = self.listbox.focus
+        src = os.path.join(self.listbox.root, focus.node)
+        dst = Pass.destination(src, self.listbox.root, node)
+        if dst == src:
+            self.message("Same as the source: {}".format(dst), alert=True)
+            return
+        if focus.isdir and dst.startswith(src + '/'):
+            self.message("Can not move a folder into itself: {}".format(dst), alert=True)
+            return
+        if os.path.isdir(os.path.join(Pass.PASS_DIR, dst)):
+            self.message("Already exists: {}".format(dst), alert=True)
+            return
+
+        copy = action == 'copy_to'
+        res = (Pass.copy if copy else Pass.move)(src, dst)
+        if res.returncode != 0:
+            self.message(res.stderr, alert=True)
+            return
+        pos = Pass.moved(src, dst, focus.isdir, copy)
+
+        # the marks follow the moved items
+        marked = self.listbox.body.marked
+        for path, isdir in [] if copy else [m for m in marked if m[0] == src
+                                            or m[0].startswith(src + '/')]:
+            marked.discard((path, isdir))
+            marked.add((dst + path[len(src):], isdir))
+        # the widgets have the old paths
+        self.listbox.body.refresh()
+        if os.path.dirname(dst) == self.listbox.root:
+            self.listbox.list_navigate(new_focus=pos)
+        self.message("{}: {} -> {}".format("Copy" if copy else "Move", src, dst))
+        self.update_view()
+        self.update_preview(True)
+        self.update_git()
+
+    def marked_files(self):
+        return sorted(path for path, isdir in self.listbox.body.marked if not isdir)
+
+    def bulk_confirm(self, edit_type, key):
+        if key not in ['y', 'Y', 'd', 'a', 'enter']:
+            self.message("Abort." if key in ['n', 'N'] else "Invalid option.",
+                         alert=key not in ['n', 'N'])
+            return
+        if self._bulk_batch is not None:
+            self.message("Wait for the running bulk operation to finish", alert=True)
+            return
+
+        if edit_type == "bulk_delete":
+            # skip the items inside marked folders, they are deleted with the folders
+            marked = sorted(self.listbox.body.marked)
+            marked = [(p, isdir) for p, isdir in marked
+                      if not any(p.startswith(q + '/') for q, d in marked if d)]
+            self.run_bulk(Pass.delete_file, marked, "Deleting",
+                          "Remove {} items from store.")
+        else:
+            self.run_bulk(Pass.generate_file, [(p, False) for p in self.marked_files()],
+                          "Generating", "Add generated passwords for {} items.")
+
+    def run_bulk(self, func, items, verb, commit_message):
+        """
+        run func on many (path, isdir) items in parallel, the folders are given
+        with a trailing '/', and commit all the changes at the end at once
+        """
+        paths = [p for p, _ in items]
+        failed = []
+
+        def progress(item, future):
+            error = future.exception()
+            if error is None and future.result().returncode != 0:
+                error = future.result().stderr
+            if error is not None:
+                failed.append(item.rstrip('/'))
+                logging.warning("{} {} failed: {}".format(verb, item, error))
+            self.message("{} {}/{}".format(verb, batch.finished, len(paths)))
+
+        def done():
+            self._bulk_batch = None
+            done_files = [p if isdir else p + '.gpg'
+                          for p, isdir in items if p not in failed]
+            res = Pass.git_commit(done_files, commit_message.format(len(done_files)))
+            # update the folders only once, at the end
+            changes = {}
+            for p in paths:
+                # the cached contents, or all of them under a deleted folder
+                Pass.invalidate(p)
+                changes.setdefault(os.path.dirname(p), set()).add(os.path.basename(p))
+            Pass.refresh(changes)
+            self.listbox.unmark_all()
+            self.listbox.focus_position = self.listbox.body.focus
+            self.update_view()
+            self.update_preview(True)
+            self.update_git()
+
+            if failed:
+                self.message("{} {} items, {} failed: {}".format(
+                    verb, len(paths), len(failed), ' '.join(failed)), alert=True)
+            elif res is not None and res.returncode != 0:
+                self.message(res.stderr or res.stdout, alert=True)
+            else:
+                self.message("{} {} items done.".format(verb, len(paths)))
+
+        batch = self._bulk_batch = Batch('bulk', func,
+                                         [p + '/' if isdir else p for p, isdir in items],
+                                         progress, done, workers=config.workers)
+        batch.start()
+
+    def reencrypt_prompt(self):
+        """ ask before re-encrypting the focused folder or password """
+        if self._reencrypt_batch is not None:
+            self.message("Re-encrypting already, {} to stop".format(self._cancel_key),
+                         alert=True)
+            return
+        focus = self.listbox.focus
+        path = os.path.join(self.listbox.root, focus.node)
+        try:
+            self._reencryption = Reencryption(path, focus.isdir)
+        except ValueError as e:
+            self.message(str(e), alert=True)
+            return
+        job = self._reencryption
+        done = (', {} done before'.format(len(job.paths) - len(job.pending))
+                if job.done else '')
+        question = 'Re-encrypt {} passwords in /{} for {}{}? [Y/n]'.format(
+            len(job.pending), path, ', '.join(job.recipients), done)
+        self.focus_edit("reencrypt", question)
+
+    def reencrypt_confirm(self, key):
+        """
+        re-encrypt the passwords in parallel, showing the progress and the time
+        left, and commit them all at once at the end
+        """
+        job = self._reencryption
+        if key not in ['y', 'Y', 'enter']:
+            self._reencryption = None
+            self.message("Abort." if key in ['n', 'N'] else "Invalid option.",
+                         alert=key not in ['n', 'N'])
+            return
+
+        job.begin()
+        before = len(job.paths) - len(job.pending)
+        start = time.monotonic()
+        failed = []
+
+        def progress(path, future):
+            error = future.exception()
+            if error is None and future.result().returncode != 0:
+                error = future.result().stderr
+            if error is not None:
+                failed.append(path)
+                logging.warning("Re-encrypting {} failed: {}".format(path, error))
+            finished = batch.finished
+            left = (time.monotonic() - start) / finished * (len(job.pending) - finished)
+            self.message("Re-encrypting {}/{}, {} left, {} to stop".format(
+                before + finished, len(job.paths), self.duration(left), self._cancel_key))
+
+        def done():
+            self._reencrypt_batch = None
+            self._reencryption = None
+            res = job.finish()
+            if failed:
+                self.message("Re-encrypted {} passwords, {} failed: {}".format(
+                    len(job.paths) - len(failed), len(failed), ' '.join(failed)),
+                    alert=True)
+            elif res is not None and res.returncode != 0:
+                self.message(res.stderr or res.stdout, alert=True)
+            else:
+                self.message("Re-encrypted {} passwords for {}.".format(
+                    len(job.paths), ', '.join(job.recipients)))
+            self.update_git()
+
+        self.message("Re-encrypting {}/{}".format(before, len(job.paths)))
+        batch = self._reencrypt_batch = Batch('reencrypt', job.reencrypt, job.pending,
+                                              progress, done, workers=config.workers)
+        batch.start()
+
+    def stop_reencryption(self):
+        """
+        stop after the running ones, the finished ones are skipped when started
+        again
+        """
+        self._reencrypt_batch.cancel()
+        self._reencrypt_batch = None
+        job, self._reencryption = self._reencryption, None
+        self.message("Stopped at {}/{}, re-encrypt /{} again to resume".format(
+            len(job.done), len(job.paths), job.root))
+
+    @staticmethod
+    def duration(seconds):
+        """ like 1h05m, 3m20s or 12s """
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
+            return '{}h{:02d}m'.format(hours, minutes)
+        if minutes:
+            return '{}m{:02d}s'.format(minutes, seconds)
+        return '{}s'.format(seconds)
+
+    def parse_pass(self, passwd):
+        # TODO: mark numbers on the side
+        """
+        parse the decryped content of the password file
+        and relate shortcut keys to the corrsponding texts
+        """
+        lines = passwd.split('\n')
+        # 1. default: yy to copy first line, ya to copy all lines
+        copiable_fields = {'a': passwd, 'y': lines[0], '1': lines[0]}
+
+        for i in range(1, min(len(lines), 10)):
+            field, sep, value = [s.strip() for s in lines[i].partition(':')]
+            # 2. y[0-9] to copy that line, right of colon if applicable
+            copiable_fields[str(i + 1)[-1]] = value if sep == ':' else field
+
+        # 3. customized field shortcuts
+        for field, value in Pass.parse_fields(passwd).items():
+            if field in config.copy_bindings:
+                copiable_fields[config.copy_bindings[field]] = value
+
+        # 4. the one time password, the code is computed when copied
+        try:
+            otp = Otp.parse(passwd)
+        except ValueError:
+            otp = None
+        if otp is not None and 'otp' in config.copy_bindings:
+            copiable_fields[config.copy_bindings['otp']] = otp
+
+        return copiable_fields
+
+    def copy_confirm(self):
+        if self.listbox.focus.isdir:
+            return
+        # reuse the preview if it is already decrypted
+        res = self._preview_result
+        if self._preview_shown and res and self._last_preview == self.listbox.focus.key:
+            if res.returncode == 0:
+                password = res.stdout
+            else:
+                self.message(res.stderr, alert=True)
+                return
+        else:
+            res = self.run_pass(Pass.show, None, self.listbox.focus.node, self.listbox.root)
+            if res.returncode == 0:
+                password = res.stdout
+            else:
+                return
+
+        pw = self.parse_pass(password.rstrip('\n'))
+        self.focus_edit("copy", 'Copy [{}]: '.format(''.join(sorted(pw))))
+        self._parsed_password = pw
+
+    def copy_by_key(self, key):
+        if key in self._parsed_password:
+            text = self._parsed_password[key]
+            if isinstance(text, Otp):
+                text = text.now()[0]
+            self.clipboard.copy(text, callback=self.copied)
+        else:
+            self.message("Nothing copied", alert=True)
+
+    def copied(self, ok):
+        if not ok:
+            self.message("Copy with {} failed".format(self.clipboard.backend), alert=True)
+            return
+        # clear the clipboard later, the timer restarts with each copy
+        if self._clip_alarm is not None:
+            self.mainloop.remove_alarm(self._clip_alarm)
+            self._clip_alarm = None
+        if self.mainloop is None or Pass.CLIP_TIME <= 0:
+            self.message("Copied.")
+            return
+        self.message("Copied. Will clear in {} seconds.".format(Pass.CLIP_TIME))
+        self._clip_deadline = time.monotonic() + Pass.CLIP_TIME
+        self._clip_alarm = self.mainloop.set_alarm_in(Pass.CLIP_TIME, lambda loop, data: (
+            setattr(self, '_clip_alarm', None), self.clipboard.restore(self.cleared)))
+
+    def cleared(self, ok):
+        if not ok:
+            self.message("Clearing the clipboard failed", alert=True)
+
+    @property
+    def clip_remaining(self):
+        """ seconds before the copied text is cleared, 0 if there is none """
+        if self._clip_alarm is None:
+            return 0
+        return max(0, self._clip_deadline - time.monotonic())
+
+    def update_find(self):
+        """ update the results of the finder as the pattern is being typed """
+        if self._edit_type != "find":
+            return
+        if not Pass.finder.ready:
+            self.editbox.set_caption('Find (indexing...): ')
+            return
+        self.editbox.set_caption('Find: ')
+        self.results.set_results(Pass.finder.find(self.editbox.edit_text))
+
+    def update_store(self):
+        """ apply the changes made to the store outside of cpass """
+        changes = Pass.watcher.read()
+        if changes is None:
+            # too many events, check all the scanned folders
+            changes = {root: set() for root in Pass.all_pass}
+        if not changes:
+            return
+        Pass.refresh(changes)
+
+        # the current folder may be removed, go up to the nearest existing one
+        root = self.listbox.root
+        while root and not os.path.isdir(os.path.join(Pass.PASS_DIR, root)):
+            root = os.path.dirname(root)
+        # the recursive counts change with anything in the subtree
+        if config.count == 'direct':
+            changed = any(r == root or os.path.dirname(r) == root for r in changes)
+        else:
+            changed = any(not root or r == root or r.startswith(root + '/')
+                          for r in changes)
+        if root != self.listbox.root or changed:
+            self.listbox.root = root
+            self.listbox.body.set_folder(Pass.all_pass[root])
+            self.listbox.focus_position = self.listbox.body.focus
+            self.update_view()
+
+        # the focused password may be modified
+        focus = self.listbox.focus
+        if not focus.empty and focus.node + '.gpg' in changes.get(self.listbox.root, ()):
+            self.update_preview(True)
+        # e.g. pulled, the new commits are read
+        self.update_git()
+
+    def update_git(self):
+        """ read the new commits of the store in background, if the git column is shown """
+        if Pass.gitlog is not None:
+            dispatcher.submit('git', Pass.gitlog.update, callback=self.git_updated)
+
+    def git_updated(self, future):
+        if future.result():
+            # the widgets are created again with the new commits
+            self.listbox.body.refresh()
+
+    def search_content(self, query):
+        """ decrypt all the passwords in parallel, and list those matching the query """
+        if not query.split():
+            self.message("No search pattern", alert=True)
+            return
+
+        self.focus_results("content")
+        paths = list(Pass.walk())
+        found = []
+
+        def progress(path, future):
+            # those failing to decrypt are counted by the batch
+            if future.exception() is None and future.result():
+                found.append(path)
+                self.results.append(path)
+            self.message("Searching {}/{}, {} found, {} to stop".format(
+                batch.finished, len(paths), len(found), self._cancel_key))
+
+        def done():
+            self.message("{} found in {} passwords{}".format(
+                len(found), len(paths), ", {} failed to decrypt".format(
+                    batch.failed) if batch.failed else ''))
+
+        batch = self._batch = Batch('search', Pass.search, paths, progress, done,
+                                    args=(query,), workers=config.workers)
+        batch.start()
+
+    def audit(self):
+        """
+        check all the passwords in parallel, and list the weak, reused and old
+        ones as they are found, grouped by folder
+        """
+        self.focus_results("audit")
+        if Pass.gitlog is None and os.path.isdir(os.path.join(Pass.PASS_DIR, '.git')):
+            # the file times are reset by a clone or a re-encryption, the commits are not
+            Pass.gitlog = GitLog(Pass.PASS_DIR)
+        if Pass.gitlog is None:
+            self.run_audit()
+            return
+
+        def updated(future):
+            if future.exception() is not None:
+                logging.warning("Reading the git log failed: {}".format(future.exception()))
+            # unless stopped or started again meanwhile
+            if self._edit_type == "audit" and self._batch is None:
+                self.run_audit()
+
+        self.message("Reading the git log")
+        dispatcher.submit('git', Pass.gitlog.update, callback=updated)
+
+    def run_audit(self):
+        paths = list(Pass.walk())
+        Pass.audit.prune(paths)
+        self._findings = {}
+        self._reused = {}
+
+        def progress(path, future):
+            if future.exception() is not None:
+                return
+            digest, score = future.result()
+            self._findings[path] = (digest, score)
+            if digest is None:
+                self.show_finding(path)
+            else:
+                # the others with the same password are shown as reused as well
+                self._reused.setdefault(digest, []).append(path)
+                for p in self._reused[digest]:
+                    self.show_finding(p)
+            self.message("Auditing {}/{}, {} to stop".format(
+                batch.finished, len(paths), self._cancel_key))
+
+        def done():
+            weak, reused, old = self.audit_counts()
+            self.message("{} weak, {} reused and {} old in {} passwords{}, {}".format(
+                weak, reused, old, len(paths), ", {} failed to decrypt".format(
+                    batch.failed) if batch.failed else '', self._next_order))
+
+        batch = self._batch = Batch('audit', Pass.audit.check, paths, progress, done,
+                                    workers=config.workers)
+        batch.start()
+
+    def issues(self, path):
+        """ (weak, times reused, age if old) of an audited password """
+        digest, score = self._findings[path]
+        reused = len(self._reused[digest]) if digest is not None else 1
+        age = time.time() - Pass.audit.changed(path)
+        return (score < config.min_score, reused if reused > 1 else 0,
+                age if config.max_age and age > config.max_age * 86400 else 0)
+
+    def audit_counts(self):
+        issues = [self.issues(p) for p in self._findings]
+        return tuple(sum(1 for i in issues if i[n]) for n in range(3))
+
+    def show_finding(self, path):
+        """ add or update the row of an audited password, in the order of the audit """
+        weak, reused, age = self.issues(path)
+        if not (weak or reused or age):
+            self.results.remove(path)
+            return
+        digest, score = self._findings[path]
+        text = ', '.join(t for t in ['weak ({}/4)'.format(score) if weak else '',
+                                     'reused {}x'.format(reused) if reused else '',
+                                     '{} old'.format(PassNode.age(age)) if age else '']
+                         if t)
+
+        order = self.AUDIT_ORDERS[self._audit_order]
+        if order == "folder":
+            folder, name = os.path.split(path)
+            if (folder, True) not in self.results:
+                self.results.insert((folder,), folder, '/' + folder, isdir=True)
+            self.results.insert((folder, name), path, '  {}  {}'.format(name, text))
+            return
+        key = {"strength": (score, path), "reuse": (-reused, digest or b'', path),
+               "age": (-age, path)}[order]
+        self.results.insert(key, path, '/{}  {}'.format(path, text))
+
+    def sort_audit(self):
+        self._audit_order = (self._audit_order + 1) % len(self.AUDIT_ORDERS)
+        self.results.set_results([])
+        for path in self._findings:
+            self.show_finding(path)
+        self.message("Sorted by {}, {}".format(self.AUDIT_ORDERS[self._audit_order],
+                                               self._next_order))
+
+    @property
+    def _next_order(self):
+        return "{} to sort by {}".format(
+            next((k for k, a in config.keybindings.items() if a == 'audit'), 'H'),
+            self.AUDIT_ORDERS[(self._audit_order + 1) % len(self.AUDIT_ORDERS)])
+
+    @property
+    def _cancel_key(self):
+        return next((k for k, a in config.keybindings.items() if a == 'cancel'), 'esc')
+
+    def search_in_dir(self, pattern, direction):
+        """ direction = 1 or -1 to specify the search direction """
+        if pattern is None:
+            self.message("No search pattern", alert=True)
+            return
+
+        # search from the next/previous, wrap if reaching bottom/top
+        start = self.listbox.focus_position
+        direction *= self._search_direction
+        # list of indexes according to the start point and order
+        indexes = list(range(len(self.listbox.body)))
+        # the math here is kind of magic, it's the result after simplification
+        search_list = (indexes[start+direction::direction] +
+                       indexes[:start+direction:direction])
+
+        for i in search_list:
+            if self.match_name(pattern, self.listbox.body.folder.entry(i)[0] or ''):
+                self.listbox.list_navigate(new_focus=i)
+                return
+
+        self.message("No matching", alert=True)
+
+    @staticmethod
+    def match_name(pattern, node):
+        # ignore case if all letters are lower case
+        if pattern == pattern.lower():
+            node = node.lower()
+
+        # search for all space separated words
+        return all([s in node for s in pattern.split()])
+
+
+def run():
+    metrics.instrument(PassList, 'dir_navigate')
+    metrics.instrument(UI, 'update_preview')
+    metrics.instrument(UI, 'search_in_dir')
+    metrics.instrument(UI, 'render')
+    if config.watch:
+        try:
+            Pass.watcher = Watcher(Pass.PASS_DIR)
+        except (OSError, AttributeError) as e:
+            # no inotify on this system
+            logging.info("Can not watch the password store: {}".format(e))
+    # in lazy mode, folders are scanned when first visited, see PassTree
+    if not config.lazy_scan:
+        Pass.extract_all()
+        startup.mark("store scanned")
+    passui = UI()
+    startup.mark("interface created")
+
+    mainloop = urwid.MainLoop(passui, palette=config.palette)
+    draw_screen = mainloop.draw_screen
+
+    def first_frame():
+        draw_screen()
+        mainloop.draw_screen = draw_screen
+        startup.mark("first frame drawn")
+        # the finder index is built in background, after the first frame so
+        # that it does not hold the GIL while starting up
+        dispatcher.submit('find', Pass.build_finder, callback=lambda f: (
+            Pass.set_finder(f.result()), passui.update_find()))
+        passui.update_git()
+    mainloop.draw_screen = first_frame
+    passui.mainloop = mainloop
+    dispatcher.attach(mainloop)
+    if Pass.watcher:
+        mainloop.watch_file(Pass.watcher.fd, passui.update_store)
+    # set no timeout after escape key
+    mainloop.screen.set_input_timeouts(complete_wait=0)
+    urwid.register_signal(UI, 'redraw')
+    urwid.connect_signal(passui, 'redraw', mainloop.screen.clear)
+    try:
+        mainloop.run()
+    finally:
+        # do not leave the copied password behind, but keep it until the clip
+        # time is over, so that it can still be pasted after quitting
+        passui.clipboard.close(passui.clip_remaining)
@@ -18,8 +18,8 @@ setup(
     author='Lu Xu',
     author_email='oliver_lew@outlook.com',
     url='https://github.com/OliverLew/cpass',
-    # Single-file module and a console script
-    py_modules=['cpass'],
+    # The core module, the urwid interface and a console script
+    py_modules=['cpass', 'cpass_tui'],
     entry_points={
         'console_scripts': [
             'cpass = cpass:main',